@@ -80,18 +80,84 @@ def load_exam_data(data_dir=".", years=range(2019, 2025)) -> pd.DataFrame:
     return data
 
 
+def _detect_decimal(file, score_cols, nrows=1000) -> str:
+    """
+    Đoán dấu thập phân của file từ nrows dòng đầu các cột điểm:
+    chỉ thấy dấu phẩy (vd "8,25") -> ","; còn lại -> ".".
+    """
+    if not score_cols:
+        return "."
+    sample = pd.read_csv(file, usecols=score_cols, nrows=nrows, dtype=str).stack()
+    has_comma = sample.str.contains(",", regex=False).any()
+    has_dot = sample.str.contains(".", regex=False).any()
+    return "," if has_comma and not has_dot else "."
+
+
+def iter_exam_chunks(data_dir=".", years=range(2019, 2025), chunksize=200_000):
+    """
+    Đọc lần lượt từng khối chunksize dòng của các file
+    diem_thi_toan_quoc_YYYY.csv (usecols = NĂM_THI + các cột điểm có trong file).
+
+    Dấu phẩy thập phân được xử lý ngay lúc parse (decimal=","); cột nào vẫn
+    ra kiểu chuỗi (file lẫn cả 2 kiểu / ký tự lạ) mới ép số như load_exam_data.
+
+    Yield: DataFrame có cột NĂM_THI (int) + các cột điểm (numeric).
+    """
+    data_dir = Path(data_dir)
+    found = False
+
+    for year in years:
+        file = data_dir / f"diem_thi_toan_quoc_{year}.csv"
+        if not file.exists():
+            print(f"⚠️ Không tìm thấy file: {file}, bỏ qua.")
+            continue
+        found = True
+
+        header = pd.read_csv(file, nrows=0).columns
+        usecols = [c for c in ["NĂM_THI"] + SUBJECTS if c in header]
+        missing = [c for c in ["NĂM_THI"] + SUBJECTS if c not in header]
+        if missing:
+            print(f"⚠️ File {file.name} thiếu cột: {missing}")
+        score_cols = [c for c in SUBJECTS if c in header]
+
+        decimal = _detect_decimal(file, score_cols)
+        print(f"Đang đọc: {file} (decimal='{decimal}')")
+        for chunk in pd.read_csv(file, usecols=usecols, decimal=decimal, chunksize=chunksize):
+            if "NĂM_THI" not in chunk.columns:
+                chunk["NĂM_THI"] = year
+            chunk["NĂM_THI"] = chunk["NĂM_THI"].astype(int)
+
+            for col in score_cols:
+                if chunk[col].dtype == object:
+                    col_str = chunk[col].str.replace(",", ".", regex=False)
+                    chunk[col] = pd.to_numeric(col_str, errors="coerce")
+            yield chunk
+
+    if not found:
+        raise FileNotFoundError(
+            "Không đọc được file CSV nào. Kiểm tra lại data_dir & years."
+        )
+
+
 # ===============================
 # 2. Hàm tạo edges (mốc biên) theo môn
 # ===============================
+MAX_SCORE = 10.0
+
+
+def bin_step(subject: str) -> float:
+    """Độ rộng bin: Toán, Ngoại ngữ = 0.2; môn khác = 0.25."""
+    if subject in ("Toán", "Ngoại ngữ"):
+        return 0.2
+    return 0.25
+
+
 def build_edges(subject: str) -> np.ndarray:
     """
     Toán, Ngoại ngữ: step = 0.2  -> [0,0.2], (0.2,0.4], ..., (9.8,10]
     Môn khác:        step = 0.25 -> [0,0.25],(0.25,0.5],...,(9.75,10]
     """
-    if subject in ("Toán", "Ngoại ngữ"):
-        step = 0.2
-    else:
-        step = 0.25
+    step = bin_step(subject)
 
     n_bins = int(10 / step)
     edges = np.linspace(0, 10, n_bins + 1)  # 0..10 inclusive
@@ -99,7 +165,70 @@ def build_edges(subject: str) -> np.ndarray:
 
 
 # ===============================
-# 3. Tạo bảng bin gọn
+# 3. Kernel đếm theo bin (dùng chung với visualize_diem_thi)
+# ===============================
+def score_bin_index(scores, step: float, max_score: float = MAX_SCORE) -> np.ndarray:
+    """
+    Chỉ số bin của từng điểm: bin 0 = [0, step], bin k = (k*step, (k+1)*step].
+
+    Cùng quy tắc với pd.cut(scores, bins=edges, right=True, include_lowest=True):
+    so trực tiếp với mốc float (np.searchsorted), không làm tròn điểm, nên
+    đúng với cả điểm lẻ nhiều chữ số.
+    Điểm NaN hoặc ngoài [0, max_score] -> -1.
+    """
+    x = np.asarray(scores, dtype=float)
+    n_bins = int(round(max_score / step))
+    edges = np.linspace(0, max_score, n_bins + 1)
+
+    idx = np.searchsorted(edges, x, side="left").astype(np.int64) - 1
+    idx[x == edges[0]] = 0
+    idx[~((x >= edges[0]) & (x <= edges[-1]))] = -1  # NaN -> False
+    return idx
+
+
+def histogram_counts(
+    bin_idx,
+    n_bins: int,
+    group_idx=None,
+    n_groups: int = 1,
+    weights=None,
+) -> np.ndarray:
+    """
+    Đếm (hoặc cộng weights) theo (nhóm, bin) trong 1 lần np.bincount.
+
+    bin_idx / group_idx < 0 bị bỏ qua.
+
+    Trả về: mảng (n_groups, n_bins)
+    """
+    bin_idx = np.asarray(bin_idx, dtype=np.int64)
+    if group_idx is None:
+        group_idx = np.zeros(len(bin_idx), dtype=np.int64)
+    group_idx = np.asarray(group_idx, dtype=np.int64)
+
+    keep = (bin_idx >= 0) & (group_idx >= 0)
+    flat = group_idx[keep] * n_bins + bin_idx[keep]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=float)[keep]
+    counts = np.bincount(flat, weights=weights, minlength=n_groups * n_bins)
+    return counts.reshape(n_groups, n_bins)
+
+
+def bin_bounds(step: float, max_score: float = MAX_SCORE):
+    """
+    (bin_start, bin_end) của từng bin, giống nhãn Interval của
+    pd.cut(..., right=True, include_lowest=True): làm tròn 3 chữ số,
+    bin đầu bắt đầu từ -0.001.
+    """
+    n_bins = int(round(max_score / step))
+    edges = np.linspace(0, max_score, n_bins + 1)
+    start = np.around(edges[:-1], 3)
+    end = np.around(edges[1:], 3)
+    start[0] = start[0] - 0.001
+    return start, end
+
+
+# ===============================
+# 4. Tạo bảng bin gọn
 # ===============================
 def build_binned_table(
     data: pd.DataFrame,
@@ -111,9 +240,12 @@ def build_binned_table(
         nam_thi, mon, bin_start, bin_end, count
 
     Mỗi dòng = 1 (năm, môn, khoảng điểm) với count > 0.
+    Mỗi môn đếm tất cả các năm trong 1 lượt (histogram_counts).
     """
-    rows = []
-    years = sorted(data["NĂM_THI"].dropna().unique())
+    frames = []
+    years = np.array(sorted(data["NĂM_THI"].dropna().unique()))
+    year_idx = np.searchsorted(years, data["NĂM_THI"].to_numpy())
+    year_idx[data["NĂM_THI"].isna().to_numpy()] = -1
 
     for subject in subjects:
         if subject not in data.columns:
@@ -121,61 +253,108 @@ def build_binned_table(
             continue
 
         print(f"Tính bin cho môn: {subject}")
-        edges = build_edges(subject)
+        step = bin_step(subject)
+        n_bins = len(bin_bounds(step)[0])
+
+        # cắt bin [0, step], (step, 2*step], ...
+        bin_idx = score_bin_index(data[subject].to_numpy(), step)
+        counts = histogram_counts(bin_idx, n_bins, year_idx, len(years))
+
+        frames.append(_binned_frame(subject, years, counts))
+
+    return _concat_binned(frames)
 
-        # chỉ giữ 2 cột cần cho môn này để nhẹ RAM
-        subj_df = data[["NĂM_THI", subject]].dropna()
 
-        for year in years:
-            scores = subj_df.loc[subj_df["NĂM_THI"] == year, subject].dropna()
-            if scores.empty:
+def build_binned_table_streaming(
+    data_dir=".",
+    years=range(2019, 2025),
+    subjects=SUBJECTS,
+    chunksize=200_000,
+) -> pd.DataFrame:
+    """
+    Giống build_binned_table(load_exam_data(data_dir, years)) nhưng đọc từng
+    khối (iter_exam_chunks) và cộng dồn số đếm theo (năm, môn), nên bộ nhớ
+    đỉnh chỉ cỡ 1 chunk thay vì toàn bộ các năm.
+    """
+    counts = {}  # (năm, môn) -> mảng đếm n_bins
+
+    for chunk in iter_exam_chunks(data_dir=data_dir, years=years, chunksize=chunksize):
+        chunk_years, year_idx = np.unique(chunk["NĂM_THI"].to_numpy(), return_inverse=True)
+        for subject in subjects:
+            if subject not in chunk.columns:
                 continue
+            step = bin_step(subject)
+            n_bins = len(bin_bounds(step)[0])
+            bin_idx = score_bin_index(chunk[subject].to_numpy(), step)
+            chunk_counts = histogram_counts(bin_idx, n_bins, year_idx, len(chunk_years))
+            for year, row in zip(chunk_years.tolist(), chunk_counts):
+                key = (year, subject)
+                if key in counts:
+                    counts[key] += row
+                else:
+                    counts[key] = row.copy()
+
+    all_years = np.array(sorted({year for year, _ in counts}), dtype=int)
+    frames = []
+    for subject in subjects:
+        subject_years = [y for y in all_years.tolist() if (y, subject) in counts]
+        if not subject_years:
+            print(f"⚠️ Không thấy cột {subject}, bỏ qua.")
+            continue
+        n_bins = len(bin_bounds(bin_step(subject))[0])
+        matrix = np.zeros((len(all_years), n_bins), dtype=np.int64)
+        for i, year in enumerate(all_years.tolist()):
+            if (year, subject) in counts:
+                matrix[i] = counts[(year, subject)]
+        frames.append(_binned_frame(subject, all_years, matrix))
 
-            # cắt bin [0, step], (step, 2*step], ...
-            cats = pd.cut(
-                scores,
-                bins=edges,
-                right=True,
-                include_lowest=True,
-            )
+    return _concat_binned(frames)
 
-            counts = cats.value_counts().sort_index()
 
-            for interval, count in counts.items():
-                if count == 0:
-                    continue  # không ghi những bin không có thí sinh
+def _binned_frame(subject, years, counts) -> pd.DataFrame:
+    """Các dòng (năm, môn, bin) từ ma trận đếm (n_years, n_bins); bỏ bin rỗng."""
+    bin_start, bin_end = bin_bounds(bin_step(subject))
+    y, b = np.nonzero(counts)
+    return pd.DataFrame({
+        "nam_thi": years[y].astype(int),
+        "mon": subject,
+        "bin_start": bin_start[b],
+        "bin_end": bin_end[b],
+        "count": counts[y, b],
+    })
 
-                rows.append(
-                    {
-                        "nam_thi": int(year),
-                        "mon": subject,
-                        "bin_start": float(interval.left),
-                        "bin_end": float(interval.right),
-                        "count": int(count),
-                    }
-                )
 
-    binned_df = pd.DataFrame(
-        rows, columns=["nam_thi", "mon", "bin_start", "bin_end", "count"]
-    )
-    return binned_df
+def _concat_binned(frames) -> pd.DataFrame:
+    columns = ["nam_thi", "mon", "bin_start", "bin_end", "count"]
+    if not frames or all(f.empty for f in frames):
+        return pd.DataFrame([], columns=columns)
+    return pd.concat(frames, ignore_index=True)[columns]
 
 
 # ===============================
-# 4. Hàm export ra CSV (dùng được cả trong notebook)
+# 5. Hàm export ra CSV (dùng được cả trong notebook)
 # ===============================
 def export_binned_csv(
     data_dir=".",
     years=range(2019, 2025),
     out_path="diem_thi_binned_2019_2024.csv",
+    chunksize=None,
 ) -> pd.DataFrame:
     """
     Đọc dữ liệu thô, bin điểm theo năm + môn, rồi ghi ra 1 CSV gọn.
 
+    chunksize: None -> đọc gộp toàn bộ (load_exam_data);
+               số dòng -> đọc streaming từng khối (build_binned_table_streaming).
+
     Trả về: DataFrame binned (để dùng luôn trong notebook nếu muốn).
     """
-    data = load_exam_data(data_dir=data_dir, years=years)
-    binned = build_binned_table(data, subjects=SUBJECTS)
+    if chunksize:
+        binned = build_binned_table_streaming(
+            data_dir=data_dir, years=years, subjects=SUBJECTS, chunksize=chunksize
+        )
+    else:
+        data = load_exam_data(data_dir=data_dir, years=years)
+        binned = build_binned_table(data, subjects=SUBJECTS)
 
     out_path = Path(out_path)
     out_path.parent.mkdir(parents=True, exist_ok=True)
@@ -188,7 +367,7 @@ def export_binned_csv(
 
 
 # ===============================
-# 5. Chạy trực tiếp file (tùy chọn)
+# 6. Chạy trực tiếp file (tùy chọn)
 # ===============================
 if __name__ == "__main__":
     # Khi chạy: python src/binned_scores.py
@@ -0,0 +1,171 @@
+"""
+Benchmark từng bước chuẩn hóa điểm chuẩn (process_diem_chuan).
+
+Sinh lịch sử điểm chuẩn giả lập giống dữ liệu crawl (mã ngành có khoảng trắng,
+năm dạng "Năm 2021", tổ hợp nhiều kiểu phân tách, ô rỗng, ngành nhiều tổ hợp,
+hệ CLC/TT...), nhân quy mô theo số trường rồi đo thời gian từng bước theo đúng
+thứ tự của process_diem_chuan.
+
+Chạy: python src/chuan_hoa_benchmark.py --scales 1 4 16 --repeat 3
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Iterable, List
+
+import numpy as np
+import pandas as pd
+
+try:
+    from chuan_hoa_diem_chuan import (
+        apply_major_khoi, chuan_hoa_ten_nganh, fill_missing_nearest_year,
+        filter_major_full_years, normalize_rows,
+    )
+except ImportError:
+    from src.chuan_hoa_diem_chuan import (
+        apply_major_khoi, chuan_hoa_ten_nganh, fill_missing_nearest_year,
+        filter_major_full_years, normalize_rows,
+    )
+
+
+COMBOS = [
+    "A00;A01", "A00, A01, D01", " D01 / D07 ", "C00", "A00 (Toán , Lý, Hóa)",
+    "D01 ;; D07", "B00|B08", "A01", "D01", "C00;D14;D15", "A00",
+]
+NAMES = [
+    "Công nghệ thông tin", "Kinh tế", "Marketing", "Luật", "Kỹ thuật phần mềm",
+    "Quản trị kinh doanh", "Kế toán", "Ngôn ngữ Anh",
+]
+VARIANTS = [[""], [""], [""], ["", "_CLC"], ["", "CLC", "TT"]]
+
+
+# ==========================
+# 1. Dữ liệu giả lập
+# ==========================
+
+def make_synthetic_history(
+    n_schools: int = 120,
+    years: Iterable[int] = range(2019, 2025),
+    seed: int = 42
+) -> pd.DataFrame:
+    """
+    Lịch sử điểm chuẩn thô (cột giống diem_chuan_all.csv, toàn bộ là chuỗi).
+
+    Mỗi trường 10–40 ngành (mã gốc không trùng nhau); mỗi ngành thiếu ngẫu
+    nhiên ~7% số năm, ~15% ngành có 2 tổ hợp / năm, ~5% dòng bị rỗng tên
+    ngành / tổ hợp hoặc mã ngành lẫn khoảng trắng, ~10% năm ghi dạng
+    "Năm 2021" / "2021.0".
+    """
+    rng = np.random.default_rng(seed)
+    years = list(years)
+    rows = []
+    for si in range(n_schools):
+        school = f"S{si:04d}"
+        for base in 7480000 + rng.choice(900, size=rng.integers(10, 41), replace=False):
+            base = str(base)
+            name = NAMES[rng.integers(len(NAMES))]
+            variants = VARIANTS[rng.integers(len(VARIANTS))]
+            multi = rng.random() < 0.15
+            for year in years:
+                if rng.random() >= 0.93:
+                    continue
+                for v in variants:
+                    code = base if v == "" else (base + v if rng.random() < 0.3 else v)
+                    for combo in rng.choice(COMBOS, size=2 if multi else 1, replace=False):
+                        if not multi and v == "" and rng.random() < 0.05:
+                            combo = ""
+                        row_name = name if rng.random() > 0.05 else (NAMES + [""])[rng.integers(len(NAMES) + 1)]
+                        row_code = code if rng.random() > 0.05 else f" {code[:3]} {code[3:]}"
+                        row_year = str(year)
+                        if rng.random() < 0.1:
+                            row_year = [f"Năm {year}", f"{year}.0"][rng.integers(2)]
+                        rows.append((
+                            school, row_code, row_name, combo,
+                            f"{rng.uniform(15, 29):.2f}", row_year,
+                            ["", "TTNV<=3"][rng.integers(2)],
+                        ))
+    return pd.DataFrame(rows, columns=[
+        "Mã trường", "Mã ngành", "Tên ngành", "Tổ hợp môn",
+        "Điểm chuẩn", "Năm xét tuyển", "Ghi chú",
+    ])
+
+
+# ==========================
+# 2. Đo từng bước
+# ==========================
+
+def run_stages(path_input, path_removed) -> List[dict]:
+    """
+    Chạy các bước như process_diem_chuan (không ghi output cuối).
+
+    Returns:
+        List dict: stage, rows_in, rows_out, seconds
+    """
+    timings = []
+
+    def timed(stage, func, df_in):
+        t0 = time.perf_counter()
+        df_out = func(df_in)
+        timings.append({
+            "stage": stage,
+            "rows_in": 0 if df_in is None else len(df_in),
+            "rows_out": len(df_out),
+            "seconds": time.perf_counter() - t0,
+        })
+        return df_out
+
+    df = timed("read_csv", lambda _: pd.read_csv(path_input, dtype=str).fillna(""), None)
+    df = timed("normalize_rows", normalize_rows, df)
+    df = timed("fill_missing_nearest_year", fill_missing_nearest_year, df)
+    df = timed("filter_major_full_years", lambda d: filter_major_full_years(d, path_removed), df)
+    df = timed("apply_major_khoi", apply_major_khoi, df)
+    timed("chuan_hoa_ten_nganh", chuan_hoa_ten_nganh, df)
+    return timings
+
+
+def benchmark_stages(
+    scales: Iterable[int] = (1, 4, 16),
+    base_schools: int = 120,
+    repeat: int = 3,
+    seed: int = 42
+) -> pd.DataFrame:
+    """
+    Thời gian từng bước theo quy mô (số trường = base_schools * scale).
+
+    Mỗi quy mô chạy repeat lần, lấy thời gian nhỏ nhất của từng bước.
+
+    Returns:
+        DataFrame: scale, stage, rows_in, rows_out, seconds
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for scale in scales:
+            path_input = tmp / f"diem_chuan_x{scale}.csv"
+            make_synthetic_history(base_schools * scale, seed=seed).to_csv(path_input, index=False)
+
+            runs = [run_stages(path_input, tmp / "diem_chuan_bi_loai.csv") for _ in range(repeat)]
+            for i, stage in enumerate(runs[0]):
+                results.append({
+                    "scale": scale,
+                    **stage,
+                    "seconds": min(run[i]["seconds"] for run in runs),
+                })
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark các bước chuẩn hóa điểm chuẩn")
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--base-schools", type=int, default=120)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    result = benchmark_stages(args.scales, args.base_schools, args.repeat)
+    print(result.to_string(index=False, float_format=lambda x: f"{x:.3f}"))
+    print()
+    print(result.pivot(index="stage", columns="scale", values="seconds")
+                .reindex(result["stage"].unique())
+                .to_string(float_format=lambda x: f"{x:.3f}"))
@@ -1,7 +1,9 @@
 import re
+import numpy as np
 import pandas as pd
 import unicodedata
 from pathlib import Path
+from typing import Iterable
 
 
 # ==========================
@@ -81,6 +83,97 @@ def remove_whitespace_major(code: str) -> str:
     return code.replace(" ", "")
 
 
+# ==========================
+# Chuẩn hóa từng dòng (vector hóa)
+# ==========================
+
+def _map_unique(values: pd.Series, func) -> pd.Series:
+    """Áp func (Series -> Series) lên các giá trị duy nhất rồi trải lại theo từng dòng."""
+    codes, uniques = pd.factorize(values)
+    mapped = func(pd.Series(uniques, dtype=object)).to_numpy()
+    return pd.Series(mapped[codes], index=values.index)
+
+
+def extract_to_hop_series(raw: pd.Series) -> pd.Series:
+    """Bản vector hóa của extract_to_hop cho cả cột (đầu vào là chuỗi, đã fillna)."""
+    return _map_unique(raw, _extract_to_hop_unique)
+
+
+def _extract_to_hop_unique(raw: pd.Series) -> pd.Series:
+    s = raw.str.strip().str.replace(r"\s+", " ", regex=True)
+    has_paren = s.str.contains(r"[()]", regex=True)
+
+    paren = (
+        s.str.replace(r"\s+\(", "(", regex=True)
+         .str.replace(r"\)\s+", ")", regex=True)
+         .str.replace(r"\(\s+", "(", regex=True)
+         .str.replace(r"\s+\)", ")", regex=True)
+         .str.strip()
+    )
+    # Sau bước gom khoảng trắng chỉ còn dấu cách đơn: bỏ khoảng trắng quanh ';' và phần rỗng
+    split = (
+        s.str.replace(r"[;,/|]+", ";", regex=True)
+         .str.replace(r"\s*;\s*", ";", regex=True)
+         .str.replace(r";{2,}", ";", regex=True)
+         .str.strip(";")
+    )
+    return paren.where(has_paren, split)
+
+
+def normalize_major_codes(ma_raw: pd.Series, school: pd.Series) -> pd.Series:
+    """
+    Bản vector hóa của normalize_major_code_logic_substring trên cả cột.
+    Base 7 số chỉ được cập nhật ở các dòng đi tới bước tách 7 số, rồi forward-fill
+    xuống các dòng sau (thay cho biến current_base_id).
+    """
+    ma = _map_unique(ma_raw, lambda u: u.str.strip())
+    empty = (ma == "") | (_map_unique(ma, lambda u: u.str.lower()) == "nan")
+
+    # Mã ngành bắt đầu bằng mã trường (so theo từng độ dài mã trường)
+    mt = _map_unique(school, lambda u: u.str.strip().str.upper())
+    mt_len = mt.str.len()
+    ma_upper = _map_unique(ma, lambda u: u.str.upper())
+    starts = pd.Series(False, index=ma.index)
+    for n in mt_len.unique():
+        rows = (mt_len == n) & (school != "")
+        starts |= rows & (ma_upper.str[:n] == mt)
+
+    reach_regex = ~empty & ~starts
+    own_base = _map_unique(ma, lambda u: u.str.extract(r"(\d{7})", expand=False)).where(reach_regex)
+    # ffill/fillna trên dtype "string": không bị cảnh báo downcast object khi cả cột là NaN
+    base = own_base.astype("string").ffill().fillna("").astype(object)
+
+    sep = pd.Series("_", index=ma.index).where(~_map_unique(ma, lambda u: u.str.startswith("_")).astype(bool), "")
+    prefixed = (base + sep + ma).where(base != "", ma)
+
+    result = prefixed.where(own_base.isna(), ma)
+    result = result.where(reach_regex, ma)
+    return result.where(~empty, "")
+
+
+def normalize_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Chuẩn hóa từng dòng của dữ liệu điểm chuẩn gốc (đã đọc dtype=str, fillna(""))
+    bằng str accessor thay cho vòng lặp iterrows.
+    """
+    def col(name: str) -> pd.Series:
+        return df[name] if name in df.columns else pd.Series("", index=df.index)
+
+    school = col("Mã trường")
+    ma_raw = col("Mã ngành").str.replace(" ", "", regex=False)
+    year = _map_unique(col("Năm xét tuyển"), lambda u: u.str.extract(r"(20\d{2})", expand=False))
+
+    return pd.DataFrame({
+        "Mã trường": school,
+        "Mã ngành": normalize_major_codes(ma_raw, school),
+        "Tên ngành": col("Tên ngành"),
+        "Tổ hợp môn": extract_to_hop_series(col("Tổ hợp môn")),
+        "Điểm chuẩn": col("Điểm chuẩn"),
+        "Năm xét tuyển": year.fillna("0").astype(int),
+        "Ghi chú": col("Ghi chú"),
+    }).reset_index(drop=True)
+
+
 # ==========================
 # Chuẩn hóa tên ngành
 # ==========================
@@ -90,56 +183,86 @@ def chuan_hoa_ten_nganh(df: pd.DataFrame) -> pd.DataFrame:
     Chuẩn hóa Tên ngành theo:
     - Nhóm các dòng cùng Mã ngành
     - Lấy tên ngành xuất hiện nhiều nhất (mode) cho toàn bộ group đó
+
+    Mode tính 1 lần cho mọi group: đếm theo (Mã ngành, Tên ngành), idxmax
+    trong từng Mã ngành rồi map ngược lại. Hòa số lần thì lấy tên xuất hiện
+    sớm nhất trong df (tất định). Lưu ý: bản cũ dùng value_counts().idxmax(),
+    thứ tự các tên hòa ở đó phụ thuộc thuật toán sort nên khi hòa có thể
+    chọn tên khác bản này.
     """
-    def get_mode(series: pd.Series) -> str:
-        counts = series.value_counts()
-        if counts.empty:
-            return ""
-        return counts.idxmax()
-
-    df["Tên ngành"] = (
-        df.groupby(["Mã ngành"])["Tên ngành"]
-          .transform(get_mode)
+    counts = (
+        df.groupby(["Mã ngành", "Tên ngành"], sort=False)
+          .size()
+          .reset_index(name="count")
     )
+    modes = counts.loc[
+        counts.groupby("Mã ngành", sort=False)["count"].idxmax(),
+        ["Mã ngành", "Tên ngành"]
+    ]
+
+    codes = df["Mã ngành"]
+    names = codes.map(pd.Series(modes["Tên ngành"].to_numpy(), index=modes["Mã ngành"]))
+    # Mã ngành chỉ có tên rỗng (NaN) -> ""
+    names[codes.notna() & names.isna()] = ""
+    df["Tên ngành"] = names
     return df
 
 
 # ==========================
-# Lọc ngành đủ năm 2019–2024
+# Lọc ngành đủ các năm bắt buộc
 # ==========================
 
-def filter_major_full_years(df_clean: pd.DataFrame, path_loai) -> pd.DataFrame:
+# Cửa sổ năm mặc định: mỗi năm có dữ liệu mới thì nới thêm
+REQUIRED_YEARS = range(2019, 2025)
+
+
+def filter_major_full_years(
+    df_clean: pd.DataFrame,
+    path_loai,
+    required_years: Iterable[int] = REQUIRED_YEARS,
+    chunksize: int = 100_000
+) -> pd.DataFrame:
     """
     Lọc ra các mã ngành (theo Mã trường + Mã ngành) có đủ
-    toàn bộ các năm 2019 → 2024.
+    toàn bộ các năm trong required_years (mặc định 2019 → 2024).
     Đồng thời lưu các hàng bị loại vào file CSV.
+
+    Mỗi nhóm đếm nunique số năm thuộc required_years; nhóm hợp lệ merge ngược
+    về thành mask theo dòng, tách 1 lần thành giữ / loại. File loại ghi dần
+    theo từng khối chunksize dòng.
     """
-    REQUIRED_YEARS = {2019, 2020, 2021, 2022, 2023, 2024}
+    keys = ["Mã trường", "Mã ngành"]
+    year_col = "Năm xét tuyển"
+    required_years = set(required_years)
     path_loai = Path(path_loai)
 
     # Xác định các nhóm hợp lệ
-    valid_groups = df_clean.groupby(
-        ["Mã trường", "Mã ngành"]
-    )["Năm xét tuyển"].apply(
-        lambda years: REQUIRED_YEARS.issubset(set(years))
-    )
-    valid_indices = valid_groups[valid_groups].index
+    years = df_clean[year_col].where(df_clean[year_col].isin(required_years))
+    n_years = years.groupby([df_clean[k] for k in keys]).nunique()
+    valid_groups = n_years[n_years == len(required_years)].index.to_frame(index=False)
+
+    mask = df_clean[keys].merge(
+        valid_groups, on=keys, how="left", indicator=True, validate="many_to_one"
+    )["_merge"].eq("both").to_numpy()
 
-    # DataFrame cuối cùng chỉ chứa các nhóm hợp lệ
+    # Cột khóa lên đầu (giống set_index(...).reset_index())
+    columns = keys + [c for c in df_clean.columns if c not in keys]
+
+    # DataFrame cuối cùng chỉ chứa các nhóm hợp lệ (index = thứ tự theo nhóm)
     df_final = (
-        df_clean.set_index(["Mã trường", "Mã ngành"])
-                .loc[valid_indices]
-                .reset_index()
-                .sort_values(by=["Mã trường", "Mã ngành", "Năm xét tuyển"])
+        df_clean.loc[mask, columns]
+                .sort_values(by=keys, kind="stable")
+                .reset_index(drop=True)
+                .sort_values(by=keys + [year_col], kind="stable")
     )
 
     # Lưu các hàng bị loại
-    df_removed = (
-        df_clean.set_index(["Mã trường", "Mã ngành"])
-                .drop(valid_indices)
-                .reset_index()
-    )
-    df_removed.to_csv(path_loai, index=False, encoding="utf-8-sig")
+    removed_idx = np.flatnonzero(~mask)
+    with open(path_loai, "w", encoding="utf-8-sig", newline="") as f:
+        df_clean.iloc[:0][columns].to_csv(f, index=False)
+        for start in range(0, len(removed_idx), chunksize):
+            chunk = df_clean.iloc[removed_idx[start:start + chunksize]][columns]
+            chunk.to_csv(f, index=False, header=False)
 
     return df_final
 
@@ -156,63 +279,54 @@ def apply_major_khoi(df):
         - Có >= 2 tổ hợp môn khác nhau
 
     Ngược lại => GIỮ NGUYÊN mã ngành.
-    """
-
-    result_rows = []
-
-    grouped = df.groupby(["Mã trường", "Năm xét tuyển", "Mã ngành"], sort=False)
-
-    for (school, year, major), group in grouped:
-
-        # Nếu chỉ có 1 dòng => giữ nguyên hết
-        if len(group) == 1:
-            result_rows.append(group.iloc[0].to_dict())
-            continue
-
-        # Lấy danh sách tổ hợp duy nhất
-        unique_khoi = group["Tổ hợp môn"].unique()
 
-        # Nếu chỉ có 1 tổ hợp => cũng giữ nguyên hết
-        if len(unique_khoi) == 1:
-            for _, r in group.iterrows():
-                result_rows.append(r.to_dict())
-            continue
+    Mã mới trong nhóm cần đổi:
+        - Dòng nhiều khối: <mã>*1, <mã>*2, ... theo thứ tự xuất hiện
+        - Dòng 1 khối: <mã>*<khối>, lặp lại thì <mã>*<khối>*1, *2, ...
 
-        # ĐẾN ĐÂY: chỉ xử lý khi có >=2 TỔ HỢP KHÁC NHAU
-        used_codes = {}
-        base_major = major
-
-        for _, r in group.iterrows():
-            tohop = str(r["Tổ hợp môn"])
-            khoi_list = [k.strip() for k in tohop.split(";") if k.strip()]
-
-            # Nếu nhiều khối → gom thành 1 nhóm, đánh số
-            if len(khoi_list) > 1:
-                if base_major not in used_codes:
-                    used_codes[base_major] = 1
-                    new_code = f"{base_major}*1"
-                else:
-                    used_codes[base_major] += 1
-                    new_code = f"{base_major}*{used_codes[base_major]}"
-
-            # Nếu chỉ 1 khối → thêm đuôi khối, tránh trùng
-            else:
-                khoi = khoi_list[0]
-                base_code = f"{base_major}*{khoi}"
-
-                if base_code not in used_codes:
-                    used_codes[base_code] = 0
-                    new_code = base_code
-                else:
-                    used_codes[base_code] += 1
-                    new_code = f"{base_code}*{used_codes[base_code]}"
-
-            # Tạo dòng kết quả
-            new_row = r.to_dict()
-            new_row["Mã ngành"] = new_code
-            result_rows.append(new_row)
-
-    return pd.DataFrame(result_rows)
+    Kết quả xếp theo nhóm (thứ tự xuất hiện đầu tiên), trong nhóm giữ thứ tự dòng.
+    """
+    if len(df) == 0:
+        return pd.DataFrame()
+
+    keys = ["Mã trường", "Năm xét tuyển", "Mã ngành"]
+    grouped = df.groupby(keys, sort=False)
+    gid = grouped.ngroup().to_numpy()
+    size = grouped.size().to_numpy()
+    n_tohop = grouped["Tổ hợp môn"].nunique(dropna=False).to_numpy()
+
+    # Bỏ dòng có key NaN (groupby loại bỏ), xếp theo nhóm rồi theo thứ tự dòng
+    order = np.flatnonzero(gid >= 0)
+    order = order[np.argsort(gid[order], kind="stable")]
+    result = df.iloc[order].reset_index(drop=True)
+    gid = gid[order]
+
+    # Chỉ nhóm >= 2 dòng và >= 2 tổ hợp khác nhau mới đổi mã
+    multi = (size[gid] > 1) & (n_tohop[gid] > 1)
+    if multi.any():
+        sub = result.loc[multi, ["Mã ngành", "Tổ hợp môn"]]
+        sub_gid = pd.Series(gid[multi], index=sub.index)
+
+        khoi = sub["Tổ hợp môn"].astype(str).str.split(";").explode().str.strip()
+        khoi = khoi[khoi != ""]
+        n_khoi = khoi.groupby(level=0).size().reindex(sub.index, fill_value=0)
+        if (n_khoi == 0).any():
+            raise ValueError("Tổ hợp môn rỗng trong nhóm có nhiều tổ hợp, không tách được mã ngành_khối.")
+        first_khoi = khoi.groupby(level=0).first().reindex(sub.index)
+
+        # Nhiều khối -> đánh số *1, *2, ... trong nhóm
+        many = n_khoi > 1
+        seq = sub_gid[many].groupby(sub_gid[many]).cumcount() + 1
+        many_codes = sub.loc[many, "Mã ngành"] + "*" + seq.astype(str)
+
+        # 1 khối -> <mã>*<khối>, trùng thì thêm *1, *2, ...
+        one = ~many
+        base_code = sub.loc[one, "Mã ngành"] + "*" + first_khoi[one]
+        dup = base_code.groupby([sub_gid[one], base_code]).cumcount()
+        one_codes = base_code.where(dup == 0, base_code + "*" + dup.astype(str))
+
+        result.loc[multi, "Mã ngành"] = pd.concat([many_codes, one_codes])
+    return result
 
 
 # ==========================
@@ -225,75 +339,98 @@ def fill_missing_nearest_year(df: pd.DataFrame) -> pd.DataFrame:
     - ưu tiên Tổ hợp môn của năm liền trước nếu có
     - nếu không có thì chọn năm gần nhất (trước hoặc sau)
     - nếu nhiều năm cùng gần thì ưu tiên năm lớn hơn
-    """
-    filled_rows = []
 
-    for (school, major), group in df.groupby(["Mã trường", "Mã ngành"]):
-        group_sorted = group.sort_values("Năm xét tuyển")
-        years = group_sorted["Năm xét tuyển"].tolist()
-
-        name_map = dict(zip(years, group_sorted["Tên ngành"]))
-        tohop_map = dict(zip(years, group_sorted["Tổ hợp môn"]))
-
-        updated_rows = []
-
-        for _, row in group_sorted.iterrows():
-            year = row["Năm xét tuyển"]
-            name = str(row["Tên ngành"]).strip()
-            tohop = str(row["Tổ hợp môn"]).strip()
-
-            # Nếu đầy đủ thì giữ nguyên
-            if name and tohop:
-                updated_rows.append(row)
-                continue
-
-            # Ưu tiên lấy tổ hợp của năm liền trước
-            if not tohop:
-                prev_year = year - 1
-                prev_tohop = str(tohop_map.get(prev_year, "")).strip()
-                if prev_tohop:
-                    row["Tổ hợp môn"] = prev_tohop
-                    tohop = prev_tohop
-
-            # Nếu vẫn thiếu thì tìm năm gần nhất
-            if not name or not tohop:
-                candidates = [
-                    y for y in years
-                    if y != year and (
-                        str(name_map.get(y, "")).strip()
-                        or str(tohop_map.get(y, "")).strip()
-                    )
-                ]
-
-                if candidates:
-                    min_dist = min(abs(y - year) for y in candidates)
-                    nearest_years = [y for y in candidates if abs(y - year) == min_dist]
-
-                    chosen_year = max(nearest_years)
-
-                    if not name:
-                        row["Tên ngành"] = name_map.get(chosen_year, "")
-                    if not tohop:
-                        row["Tổ hợp môn"] = tohop_map.get(chosen_year, "")
-
-            updated_rows.append(row)
-
-        filled_rows.extend(updated_rows)
-
-    return pd.DataFrame(filled_rows)
+    Vector hóa trên mảng đã sắp theo (Mã trường, Mã ngành, Năm xét tuyển):
+    mỗi (nhóm, năm) mã hóa thành 1 khóa số tăng dần, năm liền trước / năm gần
+    nhất tìm bằng np.searchsorted. Năm có nhiều dòng thì lấy giá trị của dòng
+    cuối cùng; sắp xếp ổn định nên thứ tự các dòng cùng năm giữ như input.
+    """
+    keys = ["Mã trường", "Mã ngành"]
+    year_col = "Năm xét tuyển"
+
+    df = df.dropna(subset=keys)
+    df = df.sort_values(keys + [year_col], kind="stable")
+    group = df.groupby(keys, sort=False).ngroup().to_numpy()
+    years = df[year_col].to_numpy()
+
+    name_raw = df["Tên ngành"].to_numpy(dtype=object)
+    tohop_raw = df["Tổ hợp môn"].to_numpy(dtype=object)
+    name = df["Tên ngành"].astype(str).str.strip().to_numpy(dtype=object)
+    tohop = df["Tổ hợp môn"].astype(str).str.strip().to_numpy(dtype=object)
+
+    # Bảng theo (nhóm, năm): dòng cuối cùng của mỗi năm; khóa số nhóm*span + năm đã sắp tăng dần
+    y_min = years.min() if len(years) else 0
+    span = (years.max() - y_min + 2) if len(years) else 1
+    key = group.astype(np.int64) * span + (years - y_min + 1)
+    last = np.r_[key[1:] != key[:-1], True] if len(key) else np.zeros(0, dtype=bool)
+    t_key, t_name, t_tohop = key[last], name_raw[last], tohop_raw[last]
+    t_tohop_strip = tohop[last]
+    t_nonempty = (name[last] != "") | (t_tohop_strip != "")
+
+    missing = np.flatnonzero((name == "") | (tohop == ""))
+
+    # Ưu tiên tổ hợp của năm liền trước
+    need_tohop = missing[tohop[missing] == ""]
+    pos = np.searchsorted(t_key, key[need_tohop] - 1)
+    pos_ok = pos < len(t_key)
+    found = np.zeros(len(need_tohop), dtype=bool)
+    found[pos_ok] = t_key[pos[pos_ok]] == key[need_tohop][pos_ok] - 1
+    prev = np.full(len(need_tohop), "", dtype=object)
+    prev[found] = t_tohop_strip[pos[found]]
+    filled = prev != ""
+    tohop_raw[need_tohop[filled]] = prev[filled]
+    tohop[need_tohop[filled]] = prev[filled]
+
+    # Còn thiếu: năm gần nhất (khác năm hiện tại) có tên hoặc tổ hợp, hòa thì lấy năm sau
+    missing = missing[(name[missing] == "") | (tohop[missing] == "")]
+    c_key = t_key[t_nonempty]
+    c_group = c_key // span
+    c_idx = np.flatnonzero(t_nonempty)
+    k = key[missing]
+    g = group[missing]
+
+    before = np.searchsorted(c_key, k, side="left") - 1
+    after = np.searchsorted(c_key, k, side="right")
+    has_before = before >= 0
+    has_before[has_before] = c_group[before[has_before]] == g[has_before]
+    has_after = after < len(c_key)
+    has_after[has_after] = c_group[after[has_after]] == g[has_after]
+
+    dist_before = np.full(len(missing), np.inf)
+    dist_before[has_before] = k[has_before] - c_key[before[has_before]]
+    dist_after = np.full(len(missing), np.inf)
+    dist_after[has_after] = c_key[after[has_after]] - k[has_after]
+    use_after = has_after & (dist_after <= dist_before)
+    use_before = has_before & ~use_after
+    chosen = np.full(len(missing), -1)
+    chosen[use_after] = c_idx[after[use_after]]
+    chosen[use_before] = c_idx[before[use_before]]
+
+    ok = chosen >= 0
+    rows, chosen = missing[ok], chosen[ok]
+    fill_name = name[rows] == ""
+    fill_tohop = tohop[rows] == ""
+    name_raw[rows[fill_name]] = t_name[chosen[fill_name]]
+    tohop_raw[rows[fill_tohop]] = t_tohop[chosen[fill_tohop]]
+
+    df = df.copy()
+    df["Tên ngành"] = name_raw
+    df["Tổ hợp môn"] = tohop_raw
+    return df
 
 
 # ==========================
 # HÀM CHÍNH: Gọi từ notebook
 # ==========================
 
-def process_diem_chuan(path_input, path_output, path_removed):
+def process_diem_chuan(path_input, path_output, path_removed, required_years: Iterable[int] = REQUIRED_YEARS):
     """
     Chuẩn hóa dữ liệu điểm chuẩn:
 
     - path_input:  CSV gốc (diem_chuan_all.csv)
     - path_output: CSV chuẩn hóa (diem_chuan_chuan_hoa.csv)
-    - path_removed: CSV lưu các ngành bị loại (không đủ 2019–2024)
+    - path_removed: CSV lưu các ngành bị loại (không đủ required_years)
+    - required_years: các năm mỗi ngành bắt buộc phải có (mặc định 2019–2024)
     """
     path_input = Path(path_input)
     path_output = Path(path_output)
@@ -306,48 +443,16 @@ def process_diem_chuan(path_input, path_output, path_removed):
         print("Không tìm thấy file input.")
         return None
 
-    clean_rows = []
-    current_base_id = ""
-
     # 1) Chuẩn hóa từng dòng
-    for _, r in df.iterrows():
-        ma_raw = r.get("Mã ngành", "")
-        ma_raw = remove_whitespace_major(ma_raw)
-
-        ten = r.get("Tên ngành", "")
-        tohop = extract_to_hop(r.get("Tổ hợp môn", ""))
-        score = r.get("Điểm chuẩn", "")
-        school = r.get("Mã trường", "")
-        ghichu = r.get("Ghi chú", "")
-
-        ma_final, new_base = normalize_major_code_logic_substring(
-            ma_raw, current_base_id, school
-        )
-        if new_base:
-            current_base_id = new_base
-
-        # Năm xét tuyển
-        y_match = re.search(r"20\d{2}", str(r.get("Năm xét tuyển", "")))
-        year = int(y_match.group(0)) if y_match else 0
-
-        clean_rows.append({
-            "Mã trường": school,
-            "Mã ngành": ma_final,
-            "Tên ngành": ten,
-            "Tổ hợp môn": tohop,
-            "Điểm chuẩn": score,
-            "Năm xét tuyển": year,
-            "Ghi chú": ghichu,
-        })
-
-    df_clean = pd.DataFrame(clean_rows)
+    df_clean = normalize_rows(df)
 
     # Điền missing
     df_clean = fill_missing_nearest_year(df_clean)
 
-    # Lọc ngành có đủ các năm 2019–2024
-    print("Đang lọc các ngành có đủ dữ liệu từ 2019 đến 2024...")
-    df_clean = filter_major_full_years(df_clean, path_removed)
+    # Lọc ngành có đủ các năm bắt buộc
+    required_years = sorted(required_years)
+    print(f"Đang lọc các ngành có đủ dữ liệu từ {required_years[0]} đến {required_years[-1]}...")
+    df_clean = filter_major_full_years(df_clean, path_removed, required_years)
 
     # Tách ngành_khối
     df_clean = apply_major_khoi(df_clean)
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
-from typing import Set, List, Dict, Tuple
+from typing import Set, List, Dict, Tuple, Optional
 import warnings
 
 import numpy as np
 import pandas as pd
-from tqdm import tqdm
+
+try:
+    from preprocessing_diem_chuan import decode_combo_masks, factorize_masks
+except ImportError:
+    from src.preprocessing_diem_chuan import decode_combo_masks, factorize_masks
 
 # Tắt warning assignment copy của pandas để log sạch hơn
 pd.options.mode.chained_assignment = None
@@ -89,7 +96,211 @@ def _fill_score_logic(
     return np.mean(scores)
 
 
-def fill_data_pretrain(input_csv: str | Path, output_csv: str | Path) -> pd.DataFrame:
+# ==========================
+# Engine vector hóa: bitmask tổ hợp + Jaccard theo nhóm
+# ==========================
+
+# Số bit 1 của từng giá trị byte (popcount bằng bảng tra)
+_POPCOUNT_LUT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(masks: np.ndarray) -> np.ndarray:
+    """Số bit 1 trên mỗi dòng của mảng bitmask (n × word uint64)."""
+    return _POPCOUNT_LUT[masks.view(np.uint8)].sum(axis=1, dtype=np.int64)
+
+
+def _encode_combo_masks(df: pd.DataFrame, cols: List[str]) -> Tuple[Dict[str, np.ndarray], np.ndarray]:
+    """
+    Mã hóa các cột tổ hợp thành bitmask theo từng dòng (giống _clean_combo_str).
+
+    Mỗi khối (A00, D01...) là 1 bit, đánh theo thứ tự khối tăng dần nên giải
+    mã theo bit cho ra đúng chuỗi của _set_to_str.
+
+    Returns:
+        masks: {cột: mảng uint64 (số dòng × số word)}
+        vocab: vocab[bit] là tên khối
+    """
+    rows, col_ids, tokens = [], [], []
+    for j, col in enumerate(cols):
+        values = pd.Series(df[col].to_numpy(), index=np.arange(len(df)))
+        parts = values[values.notna()].astype(str).str.split(";").explode().str.strip()
+        parts = parts[parts != ""].str.upper()
+        rows.append(parts.index.to_numpy(dtype=np.int64))
+        col_ids.append(np.full(len(parts), j))
+        tokens.append(parts.to_numpy(dtype=object))
+
+    rows, col_ids = np.concatenate(rows), np.concatenate(col_ids)
+    codes, vocab = pd.factorize(np.concatenate(tokens), sort=True)
+    n_words = max(1, (len(vocab) + 63) // 64)
+    bits = np.left_shift(np.uint64(1), (codes % 64).astype(np.uint64))
+
+    masks = {}
+    for j, col in enumerate(cols):
+        m = np.zeros((len(df), n_words), dtype=np.uint64)
+        sel = col_ids == j
+        np.bitwise_or.at(m, (rows[sel], codes[sel] // 64), bits[sel])
+        masks[col] = m
+    return masks, np.asarray(vocab, dtype=object)
+
+
+def _row_means(values: np.ndarray, row_ids: np.ndarray, n_rows: int) -> np.ndarray:
+    """
+    np.mean của values theo từng row_id (values đã xếp liền nhau theo row_id).
+
+    Các dòng cùng số phần tử được tính chung 1 lần (mean theo axis=1) nên kết
+    quả trùng từng bit với np.mean(list) của _fill_score_logic.
+    """
+    counts = np.bincount(row_ids, minlength=n_rows)
+    starts = np.cumsum(counts) - counts
+    out = np.full(n_rows, np.nan)
+    for c in np.unique(counts[counts > 0]):
+        sel = np.flatnonzero(counts == c)
+        out[sel] = values[starts[sel][:, None] + np.arange(c)].mean(axis=1)
+    return out
+
+
+def _fill_scores_vectorized(
+    group_codes: np.ndarray,
+    masks: np.ndarray,
+    anchor: np.ndarray,
+    scores: np.ndarray,
+    targets: np.ndarray,
+    global_mean: float
+) -> np.ndarray:
+    """
+    Điểm fill cho các dòng targets của 1 năm, cùng logic với _fill_score_logic:
+    exact match -> Jaccard weighted -> group mean; nhóm không có donor -> global mean.
+
+    Donor là dòng cùng nhóm có điểm và tổ hợp khác rỗng (theo thứ tự dòng).
+    Toàn bộ cặp (target, donor) được tạo 1 lần; Jaccard = popcount(a & b) /
+    popcount(a | b). Tổng có trọng số cộng tuần tự theo thứ tự donor để khớp
+    sum() của bản gốc.
+    """
+    n_t = len(targets)
+    donors = np.flatnonzero(~np.isnan(scores) & masks.any(axis=1))
+    donors = donors[np.argsort(group_codes[donors], kind="stable")]
+    counts = np.bincount(group_codes[donors], minlength=group_codes.max() + 1)
+    starts = np.cumsum(counts) - counts
+
+    t_group = group_codes[targets]
+    n_donors = counts[t_group]
+    pair_t = np.repeat(np.arange(n_t), n_donors)
+    offset = np.arange(len(pair_t)) - np.repeat(np.cumsum(n_donors) - n_donors, n_donors)
+    pair_d = donors[starts[t_group][pair_t] + offset]
+
+    a, d, s = anchor[targets][pair_t], masks[pair_d], scores[pair_d]
+    exact = (a == d).all(axis=1)
+    w = _popcount(a & d) / _popcount(a | d)
+
+    # Ưu tiên 1: exact match
+    n_exact = np.bincount(pair_t[exact], minlength=n_t)
+    exact_mean = _row_means(s[exact], pair_t[exact], n_t)
+
+    # Ưu tiên 2: Jaccard weighted (cộng tuần tự theo vị trí donor)
+    w_mat = np.zeros((n_t, n_donors.max(initial=0)))
+    s_mat = np.zeros_like(w_mat)
+    w_mat[pair_t, offset] = w
+    s_mat[pair_t, offset] = s
+    total_weight = np.zeros(n_t)
+    weighted_sum = np.zeros(n_t)
+    for k in range(w_mat.shape[1]):
+        total_weight += w_mat[:, k]
+        weighted_sum += w_mat[:, k] * s_mat[:, k]
+
+    # Ưu tiên 3: group mean
+    group_mean = _row_means(s, pair_t, n_t)
+
+    # Làm tròn như bản gốc: np.mean -> np.float64.__round__, weighted -> round() của float
+    use_exact = n_exact > 0
+    use_weighted = (n_donors > 0) & ~use_exact & (total_weight > 0)
+    result = np.where(use_exact, exact_mean, group_mean)
+    result = np.round(result, 2)
+    result[n_donors == 0] = round(global_mean, 2)
+    result[use_weighted] = [
+        round(float(v), 2) for v in weighted_sum[use_weighted] / total_weight[use_weighted]
+    ]
+    return result
+
+
+def _fill_partition(
+    part: pd.DataFrame,
+    fill_years: range,
+    global_means: Dict[int, float]
+) -> List[Tuple[np.ndarray, str, np.ndarray]]:
+    """
+    Fill 1 phần dữ liệu gồm trọn vẹn các nhóm _group_id.
+
+    Donor chỉ lấy từ dữ liệu gốc của chính nhóm (snapshot trước khi fill),
+    nên các phần độc lập với nhau và có thể chạy ở process khác.
+
+    Returns:
+        List (index, cột, giá trị) cần ghi vào DataFrame gốc
+    """
+    index = part.index.to_numpy()
+    group_codes, group_names = pd.factorize(part["_group_id"])
+
+    combo_cols = [f"Tổ hợp môn năm {y}" for y in fill_years]
+    masks, vocab = _encode_combo_masks(part, combo_cols + ["Tổ hợp môn năm 2024"])
+    anchor = masks["Tổ hợp môn năm 2024"]
+
+    updates = []
+    for y in fill_years:
+        col_th_y = f"Tổ hợp môn năm {y}"
+        col_sc_y = f"Điểm chuẩn năm {y}"
+
+        # --- LOGIC 1: FILL TỔ HỢP (UNION) ---
+        # Union: Hiện tại | Anchor 2024 | Toàn bộ Group năm Y
+        group_union = np.zeros((len(group_names), anchor.shape[1]), dtype=np.uint64)
+        np.bitwise_or.at(group_union, group_codes, masks[col_th_y])
+        mask_ids, distinct = factorize_masks(anchor | group_union[group_codes])
+        combo_strs = np.array(decode_combo_masks(distinct, vocab, sep=";"), dtype=object)
+        updates.append((index, col_th_y, combo_strs[mask_ids]))
+
+        # --- LOGIC 2: FILL ĐIỂM CHUẨN ---
+        # Nếu đã có điểm -> giữ nguyên (theo yêu cầu)
+        scores = part[col_sc_y].to_numpy(dtype=float)
+        targets = np.flatnonzero(np.isnan(scores))
+        if len(targets) == 0:
+            continue
+
+        filled = _fill_scores_vectorized(
+            group_codes, masks[col_th_y], anchor, scores, targets,
+            global_mean=global_means.get(y, 0.0)
+        )
+        updates.append((index[targets], col_sc_y, filled))
+    return updates
+
+
+def _apply_updates(df: pd.DataFrame, updates: List[Tuple[np.ndarray, str, np.ndarray]]) -> None:
+    """Ghi toàn bộ update (index, cột, giá trị) vào df, mỗi cột 1 lần."""
+    by_col: Dict[str, List[Tuple[np.ndarray, np.ndarray]]] = {}
+    for idx, col, values in updates:
+        by_col.setdefault(col, []).append((idx, values))
+
+    for col, items in by_col.items():
+        idx = np.concatenate([i for i, _ in items])
+        values = np.concatenate([v for _, v in items])
+        col_values = df[col].to_numpy(copy=True)
+        if values.dtype == object:
+            col_values = col_values.astype(object)
+        col_values[df.index.get_indexer(idx)] = values
+        df[col] = col_values
+
+
+def fill_data_pretrain(
+    input_csv: str | Path,
+    output_csv: str | Path,
+    n_jobs: int = 1,
+    n_partitions: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Fill Tổ hợp môn / Điểm chuẩn 2019–2023 cho các ngành có anchor 2024.
+
+    Args:
+        n_jobs: Số process (1 = chạy tại chỗ, -1 = tất cả CPU)
+        n_partitions: Số phần chia theo _group_id khi n_jobs != 1
+            (mặc định 4 × số process). Kết quả không phụ thuộc cách chia.
+    """
     input_csv = Path(input_csv)
     output_csv = Path(output_csv)
 
@@ -143,105 +354,27 @@ def fill_data_pretrain(input_csv: str | Path, output_csv: str | Path) -> pd.Data
         else:
             global_means[y] = 0.0
 
-    # 3. Xử lý theo từng Group
-    # Nhóm theo _group_id
-    grouped = df.groupby("_group_id")
-    
-    print(f"Bắt đầu fill dữ liệu cho {len(grouped)} nhóm ngành...")
-    
-    # List để thu thập các update (tránh update trực tiếp quá nhiều lần làm chậm)
-    # Tuy nhiên với logic phức tạp phụ thuộc lẫn nhau, update trực tiếp df an toàn hơn về logic
-    # nhưng ta cần cẩn thận không dùng dữ liệu "vừa fill" để fill cho dòng khác cùng năm
-    # -> dùng dữ liệu gốc (snapshot) để tìm donor.
-    
-    for group_name, group_df in tqdm(grouped, desc="Processing Groups"):
-        # group_df là DataFrame con của nhóm hiện tại
-        # Lấy index thực tế của nhóm
-        idxs = group_df.index
-        
-        # Lấy snapshot dữ liệu gốc của nhóm này (chỉ đọc)
-        # Để đảm bảo donor luôn là dữ liệu thực (real data), không phải dữ liệu fake vừa fill
-        group_df_orig = group_df.copy()
-        
-        # Lọc ra các dòng "Target" trong nhóm
-        # Vì đã lọc toàn bộ DF từ đầu, nên TẤT CẢ các dòng còn lại đều là Target hợp lệ
-        targets = []
-        for idx in idxs:
-            th24 = _clean_combo_str(df.at[idx, "Tổ hợp môn năm 2024"])
-            # th24 chắc chắn không rỗng vì đã lọc ở trên
-            targets.append((idx, th24)) 
-        
-        if not targets:
-            continue
+    # 3. Xử lý theo từng Group (vector hóa trên toàn bộ nhóm)
+    # Donor chỉ lấy từ dữ liệu gốc của nhóm (snapshot trước khi fill)
+    group_codes, group_names = pd.factorize(df["_group_id"])
+    print(f"Bắt đầu fill dữ liệu cho {len(group_names)} nhóm ngành...")
 
-        # Cache tổ hợp của cả nhóm cho từng năm để dùng cho logic Union
-        # (Union của TẤT CẢ tổ hợp Y trong group)
-        group_combos_by_year = {}
-        for y in fill_years:
-            col_th = f"Tổ hợp môn năm {y}"
-            if col_th not in df.columns: continue
-            
-            # Lấy tất cả combo có trong cột này của nhóm
-            all_combos = set()
-            raw_vals = group_df_orig[col_th].dropna()
-            for val in raw_vals:
-                all_combos.update(_clean_combo_str(val))
-            group_combos_by_year[y] = all_combos
-
-        # --- Bắt đầu Fill cho từng Target ---
-        for target_idx, anchor_combos in targets:
-            
-            for y in fill_years:
-                col_th_y = f"Tổ hợp môn năm {y}"
-                col_sc_y = f"Điểm chuẩn năm {y}"
-                
-                # --- LOGIC 1: FILL TỔ HỢP (UNION) ---
-                # Lấy tổ hợp hiện tại của dòng target (nếu có)
-                current_combos = _clean_combo_str(df.at[target_idx, col_th_y])
-                
-                # Lấy tổ hợp của toàn group năm đó
-                group_combos = group_combos_by_year.get(y, set())
-                
-                # Union: Hiện tại | Anchor 2024 | Toàn bộ Group năm Y
-                final_combos = current_combos | anchor_combos | group_combos
-                
-                # Cập nhật vào DataFrame
-                df.at[target_idx, col_th_y] = _set_to_str(final_combos)
-                
-                # --- LOGIC 2: FILL ĐIỂM CHUẨN ---
-                current_score = df.at[target_idx, col_sc_y]
-                
-                # Nếu đã có điểm -> giữ nguyên (theo yêu cầu)
-                if pd.notna(current_score):
-                    continue
-                
-                # Tìm Donors từ snapshot gốc (group_df_orig)
-                # Donor là dòng có Tổ hợp != rỗng VÀ Điểm != NaN ở năm Y
-                donors = []
-                # Lấy dữ liệu raw từ numpy array để tăng tốc thay vì iterrows
-                valid_donors_mask = (
-                    group_df_orig[col_th_y].notna() & 
-                    (group_df_orig[col_th_y].str.strip() != "") &
-                    group_df_orig[col_sc_y].notna()
-                )
-                valid_donors_df = group_df_orig[valid_donors_mask]
-                
-                for _, row in valid_donors_df.iterrows():
-                    d_combos = _clean_combo_str(row[col_th_y])
-                    if d_combos: # Double check
-                        donors.append({
-                            'score': float(row[col_sc_y]),
-                            'combos': d_combos
-                        })
-                
-                # Tính toán điểm fill
-                filled_val = _fill_score_logic(
-                    target_anchor_combos=anchor_combos,
-                    donors=donors,
-                    global_mean=global_means.get(y, 0.0)
-                )
-                
-                df.at[target_idx, col_sc_y] = round(filled_val, 2)
+    cols = ["_group_id"] + [
+        f"{base} năm {y}" for base in ["Tổ hợp môn", "Điểm chuẩn"] for y in [*fill_years, 2024]
+    ]
+    if n_jobs == 1 or len(group_names) <= 1:
+        updates = _fill_partition(df[cols], fill_years, global_means)
+    else:
+        # Chia các nhóm thành các khoảng liên tiếp, mỗi phần chứa trọn nhóm
+        workers = os.cpu_count() if n_jobs < 0 else n_jobs
+        n_parts = min(n_partitions or 4 * workers, len(group_names))
+        part_ids = group_codes * n_parts // len(group_names)
+        parts = [df.loc[part_ids == i, cols] for i in range(n_parts)]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_fill_partition, parts, repeat(fill_years), repeat(global_means))
+            updates = [u for part_updates in results for u in part_updates]
+
+    _apply_updates(df, updates)
 
     # Dọn dẹp cột tạm
     df = df.drop(columns=["_group_id"])
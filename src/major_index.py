@@ -0,0 +1,195 @@
+"""
+Index tìm ngành tương tự (nearest neighbour) trên vector TF-IDF tên ngành.
+
+- BruteForceIndex: chính xác, nhân sparse mat-vec với toàn bộ catalog (baseline)
+- LSHIndex: xấp xỉ bằng random-projection LSH (SimHash), nhiều bảng băm +
+  dò thêm các bucket lệch 1 bit, sau đó xếp hạng lại chính xác trên ứng viên
+
+Cả 2 index nhận vector đã chuẩn hóa L2 nên tích vô hướng = cosine similarity.
+benchmark_indexes() đo recall@M (so với brute force) và độ trễ truy vấn.
+"""
+
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+
+def _top_m(ids: np.ndarray, sims: np.ndarray, m: int) -> Tuple[np.ndarray, np.ndarray]:
+    """M phần tử similarity cao nhất, giảm dần (hòa thì id nhỏ trước)."""
+    if len(ids) > m:
+        part = np.argpartition(-sims, m - 1)[:m]
+        ids, sims = ids[part], sims[part]
+    order = np.lexsort((ids, -sims))
+    return ids[order], sims[order]
+
+
+class BruteForceIndex:
+    """Index chính xác: cosine tới mọi vector."""
+
+    def __init__(self, vectors):
+        self.vectors = sparse.csr_matrix(normalize(vectors))
+
+    def __len__(self) -> int:
+        return self.vectors.shape[0]
+
+    def similarities(self, query: np.ndarray) -> np.ndarray:
+        """Cosine tới toàn bộ vector (query đã chuẩn hóa L2)."""
+        return np.asarray(self.vectors @ query).ravel()
+
+    def top_m(self, query: np.ndarray, m: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(ids, similarities) của M vector gần nhất."""
+        return _top_m(np.arange(len(self)), self.similarities(query), m)
+
+
+class LSHIndex(BruteForceIndex):
+    """
+    Random-projection LSH: mỗi bảng dùng n_planes siêu phẳng ngẫu nhiên,
+    mã bucket = dấu của các hình chiếu. Truy vấn lấy hợp các bucket khớp
+    (và lệch 1 bit nếu multi_probe) rồi xếp hạng lại bằng cosine chính xác.
+    """
+
+    def __init__(
+        self,
+        vectors,
+        n_planes: int = 6,
+        n_tables: int = 8,
+        multi_probe: bool = True,
+        seed: int = 42
+    ):
+        super().__init__(vectors)
+        if n_planes > 62:
+            raise ValueError("n_planes phải <= 62 để mã bucket vừa int64.")
+        self.n_planes, self.n_tables, self.multi_probe = n_planes, n_tables, multi_probe
+
+        rng = np.random.default_rng(seed)
+        self.planes = rng.standard_normal((self.vectors.shape[1], n_tables * n_planes))
+        self._powers = 1 << np.arange(n_planes, dtype=np.int64)
+
+        codes = self._codes(np.asarray(self.vectors @ self.planes))
+        self.tables = []
+        for t in range(n_tables):
+            order = np.argsort(codes[:, t], kind='stable')
+            keys, starts = np.unique(codes[order, t], return_index=True)
+            self.tables.append(dict(zip(keys.tolist(), np.split(order, starts[1:]))))
+
+    def _codes(self, projections: np.ndarray) -> np.ndarray:
+        """Hình chiếu (n × n_tables*n_planes) -> mã bucket (n × n_tables)."""
+        bits = (projections > 0).reshape(len(projections), self.n_tables, self.n_planes)
+        return bits.astype(np.int64) @ self._powers
+
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """Id các vector cùng bucket với query trên ít nhất 1 bảng."""
+        codes = self._codes((query @ self.planes)[None, :])[0]
+        found = []
+        for t, code in enumerate(codes.tolist()):
+            probes = [code]
+            if self.multi_probe:
+                probes += [code ^ int(p) for p in self._powers]
+            for c in probes:
+                ids = self.tables[t].get(c)
+                if ids is not None:
+                    found.append(ids)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def top_m(self, query: np.ndarray, m: int) -> Tuple[np.ndarray, np.ndarray]:
+        ids = self.candidates(query)
+        sims = np.asarray(self.vectors[ids] @ query).ravel()
+        return _top_m(ids, sims, m)
+
+
+INDEX_TYPES = {
+    'brute': BruteForceIndex,
+    'lsh': LSHIndex,
+}
+
+
+def build_index(vectors, kind: str = 'brute', **kwargs) -> BruteForceIndex:
+    """Tạo index theo tên ('brute' | 'lsh')."""
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"Index không hỗ trợ: {kind}. Chọn: {list(INDEX_TYPES)}")
+    return INDEX_TYPES[kind](vectors, **kwargs)
+
+
+def sample_queries(vectors, n_queries: int = 200, max_selected: int = 3, seed: int = 42) -> np.ndarray:
+    """Query giả lập: trung bình 1..max_selected ngành ngẫu nhiên, chuẩn hóa L2 (như profile NV)."""
+    vectors = sparse.csr_matrix(vectors)
+    rng = np.random.default_rng(seed)
+    queries = []
+    for _ in range(n_queries):
+        ids = rng.choice(vectors.shape[0], size=rng.integers(1, max_selected + 1), replace=False)
+        q = np.asarray(vectors[ids].mean(axis=0)).ravel()
+        norm = np.linalg.norm(q)
+        queries.append(q / norm if norm > 0 else q)
+    return np.array(queries)
+
+
+def benchmark_indexes(
+    vectors,
+    m: int = 50,
+    n_queries: int = 200,
+    configs: Optional[List[dict]] = None,
+    seed: int = 42
+) -> pd.DataFrame:
+    """
+    So sánh recall@M và độ trễ của brute force với các cấu hình LSH.
+
+    Args:
+        vectors: Ma trận vector tên ngành (vd RecommendationEngine.tfidf_matrix)
+        m: Số ngành lấy ra mỗi truy vấn
+        configs: List kwargs cho LSHIndex
+
+    Returns:
+        DataFrame: index, params, build_ms, query_ms (trung bình), recall
+    """
+    if configs is None:
+        configs = [
+            {'n_planes': 6, 'n_tables': 8},
+            {'n_planes': 8, 'n_tables': 8},
+            {'n_planes': 10, 'n_tables': 16},
+        ]
+    queries = sample_queries(vectors, n_queries=n_queries, seed=seed)
+
+    t0 = time.perf_counter()
+    exact = BruteForceIndex(vectors)
+    build_ms = (time.perf_counter() - t0) * 1000
+
+    # Recall tính theo ngưỡng similarity thứ M (ngành hòa điểm ở biên đều tính là đúng)
+    t0 = time.perf_counter()
+    thresholds = [exact.top_m(q, m)[1][-1] for q in queries]
+    rows = [{
+        'index': 'brute', 'params': '', 'build_ms': build_ms,
+        'query_ms': (time.perf_counter() - t0) * 1000 / len(queries), 'recall': 1.0
+    }]
+
+    for params in configs:
+        t0 = time.perf_counter()
+        index = LSHIndex(vectors, seed=seed, **params)
+        build_ms = (time.perf_counter() - t0) * 1000
+        t0 = time.perf_counter()
+        found = [index.top_m(q, m)[1] for q in queries]
+        query_ms = (time.perf_counter() - t0) * 1000 / len(queries)
+        recall = np.mean([
+            np.sum(sims >= thr - 1e-12) / min(m, len(exact)) for sims, thr in zip(found, thresholds)
+        ])
+        rows.append({
+            'index': 'lsh', 'params': str(params), 'build_ms': build_ms,
+            'query_ms': query_ms, 'recall': recall
+        })
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    try:
+        from recsys import load_data, RecommendationEngine
+    except ImportError:
+        from src.recsys import load_data, RecommendationEngine
+
+    engine = RecommendationEngine(load_data())
+    print(f"Số tên ngành: {engine.tfidf_matrix.shape[0]} | Vocab: {engine.tfidf_matrix.shape[1]}")
+    print(benchmark_indexes(engine.tfidf_matrix).to_string(index=False))
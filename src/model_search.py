@@ -0,0 +1,414 @@
+"""
+Tìm model + hyperparameter cho bài toán dự đoán điểm chuẩn.
+
+Chiến lược: Rolling-origin cross-validation theo năm
+- Fold 2021: train target 2020           → valid target 2021
+- Fold 2022: train target 2020-2021      → valid target 2022
+- Fold 2023: train target 2020-2022      → valid target 2023
+- Target chỉ cần có điểm năm N-1 (MIN_HISTORY); năm lịch sử nằm ngoài dữ liệu
+  (vd target 2020 không có điểm 2016-2018) để NaN rồi điền bằng median của
+  train trong fold, không lấy giá trị của năm mới hơn.
+- Năm test TEST_YEAR (2024) của predict_admission_score không dùng làm valid.
+
+Search: Random search hoặc Successive Halving trên nhiều họ model.
+- Features mỗi năm target chỉ build 1 lần (qua feature store), các fold/config dùng chung.
+- Successive Halving: rung đầu chỉ chạy fold rẻ nhất (ít dữ liệu train nhất),
+  mỗi rung giữ lại 1/eta config tốt nhất và chạy thêm fold mới.
+- Config thắng được lưu thành spec JSON; predict_admission_score.main refit
+  model từ spec này (refit_from_spec) nếu file spec tồn tại.
+"""
+
+import os
+import json
+import math
+from typing import List, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.model_selection import ParameterSampler
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.preprocessing import StandardScaler
+
+try:
+    from predict_admission_score import (
+        DATA_DIR, FEATURE_COLS, MODEL_FAMILIES, TEST_YEAR,
+        available_model_names, build_model, load_data, load_or_build_features,
+    )
+except ImportError:
+    from src.predict_admission_score import (
+        DATA_DIR, FEATURE_COLS, MODEL_FAMILIES, TEST_YEAR,
+        available_model_names, build_model, load_data, load_or_build_features,
+    )
+
+
+SPEC_PATH = os.path.join(DATA_DIR, 'best_model_spec.json')
+
+# Không gian hyperparameter cho từng họ model
+SEARCH_SPACE = {
+    'Linear Regression': {},
+    'Ridge Regression': {'alpha': [0.01, 0.1, 0.3, 1.0, 3.0, 10.0, 30.0, 100.0]},
+    'Lasso Regression': {'alpha': [0.001, 0.003, 0.01, 0.03, 0.1, 0.3, 1.0]},
+    'Random Forest': {
+        'n_estimators': [100, 200, 400],
+        'max_depth': [None, 6, 10, 16],
+        'min_samples_leaf': [1, 2, 5, 10],
+        'max_features': [1.0, 0.7, 0.5, 'sqrt'],
+    },
+    'Gradient Boosting': {
+        'n_estimators': [100, 200, 400],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_depth': [2, 3, 4, 5],
+        'subsample': [0.7, 0.85, 1.0],
+    },
+    'XGBoost': {
+        'n_estimators': [100, 200, 400],
+        'learning_rate': [0.03, 0.05, 0.1, 0.2],
+        'max_depth': [3, 4, 6, 8],
+        'subsample': [0.7, 0.85, 1.0],
+        'colsample_bytree': [0.6, 0.8, 1.0],
+    },
+}
+
+# Số năm lịch sử tối thiểu của 1 target (features dùng N-1..N-4, thiếu thì NaN)
+MIN_HISTORY = 1
+
+
+# =============================================================================
+# 1. FEATURE CACHE & FOLDS
+# =============================================================================
+
+def history_target_years(pretrain: pd.DataFrame, min_history: int = MIN_HISTORY) -> List[int]:
+    """
+    Các năm target Y mà pretrain có cột điểm Y và Y-1..Y-min_history.
+
+    Các năm lịch sử xa hơn có thể nằm ngoài dữ liệu: cột N-k tương ứng rỗng
+    và được make_rolling_folds điền bằng median của train.
+    """
+    years = {int(c.split('_', 1)[1]) for c in pretrain.columns if c.startswith('score_')}
+    return sorted(y for y in years if all(y - k in years for k in range(min_history + 1)))
+
+
+def build_feature_cache(
+    pretrain: pd.DataFrame,
+    schools: pd.DataFrame,
+    provinces: pd.DataFrame,
+    summaries: Dict[int, pd.DataFrame],
+    target_years: List[int],
+    radius_km: float = 500
+) -> Dict[int, pd.DataFrame]:
+    """Build features cho từng năm target (mỗi năm 1 lần)."""
+    cache = {}
+    for year in target_years:
+        print(f"  Building features for target_year={year}...")
+        df = load_or_build_features(
+            pretrain, schools, provinces, summaries,
+            target_year=year, radius_km=radius_km
+        )
+        cache[year] = df
+        print(f"    {len(cache[year])} samples")
+    return cache
+
+
+def make_rolling_folds(
+    feature_cache: Dict[int, pd.DataFrame],
+    valid_years: List[int]
+) -> List[Dict]:
+    """
+    Tạo rolling-origin folds: valid = năm Y, train = tất cả năm target < Y.
+
+    Ma trận X/y của mỗi fold được tạo 1 lần và dùng lại cho mọi config.
+    """
+    folds = []
+    for valid_year in valid_years:
+        train_years = [y for y in sorted(feature_cache) if y < valid_year]
+        if not train_years or valid_year not in feature_cache:
+            continue
+
+        df_train = pd.concat([feature_cache[y] for y in train_years], ignore_index=True)
+        df_valid = feature_cache[valid_year]
+
+        X_train = df_train[FEATURE_COLS].values
+        X_valid = df_valid[FEATURE_COLS].values
+
+        # Năm lịch sử ngoài dữ liệu (NaN) → median của train; cột rỗng toàn bộ trong train → 0
+        medians = np.nan_to_num(np.nanmedian(X_train, axis=0))
+        X_train = np.where(np.isnan(X_train), medians, X_train)
+        X_valid = np.where(np.isnan(X_valid), medians, X_valid)
+
+        scaler = StandardScaler()
+        folds.append({
+            'valid_year': valid_year,
+            'train_years': train_years,
+            'X_train': X_train,
+            'y_train': df_train['score_target'].values,
+            'X_valid': X_valid,
+            'y_valid': df_valid['score_target'].values,
+            'X_train_scaled': scaler.fit_transform(X_train),
+            'X_valid_scaled': scaler.transform(X_valid),
+        })
+    return folds
+
+
+# =============================================================================
+# 2. CONFIG SAMPLING & EVALUATION
+# =============================================================================
+
+def sample_configs(
+    model_names: List[str] = None,
+    n_iter: int = 10,
+    random_state: int = 42
+) -> List[Dict]:
+    """
+    Lấy ngẫu nhiên n_iter config cho mỗi họ model.
+
+    Mỗi config là 1 spec: {'model': tên họ model, 'params': {...}}.
+    """
+    if model_names is None:
+        model_names = available_model_names()
+
+    configs = []
+    for name in model_names:
+        space = SEARCH_SPACE.get(name, {})
+        if not space:
+            configs.append({'model': name, 'params': {}})
+            continue
+        n_total = math.prod(len(v) for v in space.values())
+        sampler = ParameterSampler(space, n_iter=min(n_iter, n_total), random_state=random_state)
+        configs.extend({'model': name, 'params': dict(p)} for p in sampler)
+    return configs
+
+
+def evaluate_on_fold(spec: Dict, fold: Dict) -> Dict:
+    """Train 1 config trên 1 fold, trả về metrics trên valid."""
+    model = build_model(spec['model'], spec['params'])
+    if 'Regression' in spec['model']:
+        model.fit(fold['X_train_scaled'], fold['y_train'])
+        y_pred = model.predict(fold['X_valid_scaled'])
+    else:
+        model.fit(fold['X_train'], fold['y_train'])
+        y_pred = model.predict(fold['X_valid'])
+
+    y_valid = fold['y_valid']
+    return {
+        'valid_year': fold['valid_year'],
+        'MAE': mean_absolute_error(y_valid, y_pred),
+        'RMSE': np.sqrt(mean_squared_error(y_valid, y_pred)),
+        'R2': r2_score(y_valid, y_pred),
+    }
+
+
+def _evaluate_jobs(jobs: List[Tuple[int, Dict, Dict]], n_jobs: int) -> List[Tuple[int, Dict]]:
+    """Chạy song song danh sách (config_id, spec, fold)."""
+    outputs = Parallel(n_jobs=n_jobs)(
+        delayed(evaluate_on_fold)(spec, fold) for _, spec, fold in jobs
+    )
+    return [(cid, out) for (cid, _, _), out in zip(jobs, outputs)]
+
+
+# =============================================================================
+# 3. SEARCH
+# =============================================================================
+
+def successive_halving_search(
+    configs: List[Dict],
+    folds: List[Dict],
+    eta: int = 3,
+    n_jobs: int = -1,
+    metric: str = 'R2'
+) -> pd.DataFrame:
+    """
+    Successive Halving với resource = số fold (fold cũ nhất chạy trước).
+
+    Rung k chạy config còn sống trên fold thứ k, xếp hạng theo trung bình metric
+    trên các fold đã chạy rồi giữ lại 1/eta config. Rung cuối chạy đủ mọi fold.
+
+    Returns:
+        DataFrame mỗi dòng = 1 config, cột metric trung bình + số fold đã chạy.
+    """
+    higher_is_better = metric == 'R2'
+    fold_results = {cid: [] for cid in range(len(configs))}
+    alive = list(range(len(configs)))
+
+    for rung, fold in enumerate(folds):
+        is_last = rung == len(folds) - 1
+
+        jobs = [(cid, configs[cid], fold) for cid in alive]
+        for cid, res in _evaluate_jobs(jobs, n_jobs):
+            fold_results[cid].append(res)
+
+        means = {cid: np.mean([r[metric] for r in fold_results[cid]]) for cid in alive}
+        ranked = sorted(alive, key=lambda c: means[c], reverse=higher_is_better)
+
+        print(f"  Rung {rung} (valid {fold['valid_year']}): {len(alive)} configs, "
+              f"best {metric} = {means[ranked[0]]:.4f}")
+
+        if not is_last:
+            alive = ranked[:max(1, math.ceil(len(ranked) / eta))]
+
+    return _summarize(configs, fold_results, metric)
+
+
+def random_search(
+    configs: List[Dict],
+    folds: List[Dict],
+    n_jobs: int = -1,
+    metric: str = 'R2'
+) -> pd.DataFrame:
+    """Random search: mọi config đều chạy đủ mọi fold."""
+    fold_results = {cid: [] for cid in range(len(configs))}
+    jobs = [(cid, configs[cid], fold) for cid in range(len(configs)) for fold in folds]
+    for cid, res in _evaluate_jobs(jobs, n_jobs):
+        fold_results[cid].append(res)
+    return _summarize(configs, fold_results, metric)
+
+
+def _summarize(configs: List[Dict], fold_results: Dict[int, List[Dict]], metric: str) -> pd.DataFrame:
+    rows = []
+    for cid, results in fold_results.items():
+        if not results:
+            continue
+        rows.append({
+            'model': configs[cid]['model'],
+            'params': json.dumps(configs[cid]['params'], sort_keys=True),
+            'n_folds': len(results),
+            'MAE': np.mean([r['MAE'] for r in results]),
+            'RMSE': np.mean([r['RMSE'] for r in results]),
+            'R2': np.mean([r['R2'] for r in results]),
+        })
+    df = pd.DataFrame(rows)
+    # Config chạy nhiều fold hơn (sống sót lâu hơn) đứng trước
+    return df.sort_values(
+        ['n_folds', metric], ascending=[False, metric != 'R2']
+    ).reset_index(drop=True)
+
+
+# =============================================================================
+# 4. MODEL SPEC
+# =============================================================================
+
+def save_model_spec(spec: Dict, path: str = SPEC_PATH) -> None:
+    """Lưu spec (tên model + params + metrics) ra JSON."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(spec, f, ensure_ascii=False, indent=2)
+
+
+def load_model_spec(path: str = SPEC_PATH) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def refit_from_spec(spec: Dict, df_full: pd.DataFrame) -> Dict:
+    """
+    Train lại model từ spec trên toàn bộ df_full.
+
+    Trả về dict cùng format với retrain_best_model_on_full_data (dùng được cho predict_scores).
+    """
+    if spec['model'] not in MODEL_FAMILIES:
+        raise ValueError(f"Không hỗ trợ model: {spec['model']}")
+
+    X_full = df_full[FEATURE_COLS].values
+    y_full = df_full['score_target'].values
+
+    scaler = StandardScaler()
+    X_full_scaled = scaler.fit_transform(X_full)
+
+    model = build_model(spec['model'], spec['params'])
+    if 'Regression' in spec['model']:
+        model.fit(X_full_scaled, y_full)
+    else:
+        model.fit(X_full, y_full)
+
+    print(f"\nRefit {spec['model']} {spec['params']} on {len(df_full)} samples")
+
+    return {
+        'best_model': model,
+        'best_model_name': spec['model'],
+        'best_params': spec['params'],
+        'scaler': scaler
+    }
+
+
+# =============================================================================
+# 5. MAIN
+# =============================================================================
+
+def main(
+    valid_years: List[int] = None,
+    strategy: str = 'halving',
+    n_iter: int = 10,
+    eta: int = 3,
+    n_jobs: int = -1,
+    radius_km: float = 500,
+    spec_path: str = SPEC_PATH
+) -> Tuple[pd.DataFrame, Dict]:
+    """
+    valid_years: Năm target dùng làm valid (mặc định: mọi năm target hợp lệ,
+                 trừ năm đầu tiên vì không có target nào trước đó để train
+                 và trừ TEST_YEAR).
+    """
+    print("\nLoading data...")
+    schools, provinces, pretrain, summaries = load_data()
+
+    eligible = history_target_years(pretrain)
+    if valid_years is None:
+        valid_years = [y for y in eligible[1:] if y != TEST_YEAR]
+    skipped = [y for y in valid_years if y not in eligible[1:]]
+    if skipped:
+        print(f"⚠️ Bỏ qua valid_years thiếu điểm {MIN_HISTORY} năm trước "
+              f"hoặc không có năm train trước: {skipped}")
+    valid_years = [y for y in valid_years if y in eligible[1:]]
+    if TEST_YEAR in valid_years:
+        print(f"⚠️ valid_years có năm test {TEST_YEAR}: predict_admission_score.main sẽ từ chối spec này")
+    if not valid_years:
+        raise ValueError(f"Không có năm valid nào tạo được fold (target hợp lệ: {eligible})")
+    if strategy == 'halving' and len(valid_years) < 2:
+        raise ValueError(
+            f"Successive halving cần ít nhất 2 fold, chỉ có {valid_years}. "
+            f"Thêm valid_years hoặc dùng strategy='random'."
+        )
+
+    print("=" * 60)
+    print(f"MODEL SEARCH ({strategy}) - Rolling-origin folds: {valid_years}")
+    print("=" * 60)
+
+    target_years = [y for y in eligible if y <= max(valid_years)]
+    print("\nBuilding feature cache...")
+    feature_cache = build_feature_cache(
+        pretrain, schools, provinces, summaries, target_years, radius_km
+    )
+    folds = make_rolling_folds(feature_cache, valid_years)
+
+    configs = sample_configs(n_iter=n_iter)
+    print(f"\nSearching {len(configs)} configs on {len(folds)} folds...")
+
+    if strategy == 'halving':
+        results = successive_halving_search(configs, folds, eta=eta, n_jobs=n_jobs)
+    elif strategy == 'random':
+        results = random_search(configs, folds, n_jobs=n_jobs)
+    else:
+        raise ValueError(f"Không hỗ trợ strategy: {strategy}")
+
+    best = results.iloc[0]
+    spec = {
+        'model': best['model'],
+        'params': json.loads(best['params']),
+        'cv': {
+            'valid_years': [f['valid_year'] for f in folds],
+            'MAE': float(best['MAE']),
+            'RMSE': float(best['RMSE']),
+            'R2': float(best['R2']),
+        },
+        'radius_km': radius_km,
+    }
+    save_model_spec(spec, spec_path)
+
+    print("\n--- Top 10 configs ---")
+    print(results.head(10).to_string())
+    print(f"\nBest spec saved to: {spec_path}")
+
+    return results, spec
+
+
+if __name__ == '__main__':
+    results, spec = main()
@@ -10,10 +10,15 @@ Author: Generated by Antigravity
 """
 
 import os
+import sys
 import math
+import hashlib
+import argparse
 import warnings
-from typing import List, Tuple, Dict
+from datetime import datetime
+from typing import List, Tuple, Dict, Optional
 
+import joblib
 import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
@@ -27,6 +32,10 @@ warnings.filterwarnings('ignore')
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
+MODEL_DIR = os.path.join(BASE_DIR, 'models')
+
+# Năm test hold-out của main(): không được dùng để chọn model / hyperparameter
+TEST_YEAR = 2024
 
 
 # =============================================================================
@@ -228,19 +237,184 @@ def parse_subject_combos(combo_str: str) -> List[str]:
     return [c.strip() for c in str(combo_str).split(';')]
 
 
+def build_feature_record(
+    row: pd.Series,
+    schools: pd.DataFrame,
+    provinces: pd.DataFrame,
+    summaries: Dict[int, pd.DataFrame],
+    target_year: int,
+    radius_km: float = 500,
+    require_target: bool = True
+) -> Optional[Dict]:
+    """
+    Tính features cho 1 ngành (1 dòng của data_pretrain_filled.csv).
+    
+    Trả về None nếu ngành không đủ dữ liệu (thiếu điểm năm N-1 hoặc thiếu cột năm target).
+    """
+    school_code = row['school_code']
+    major_code = row['major_code']
+    major_name = row['major_name']
+    
+    # Lấy danh sách tỉnh trong bán kính
+    nearby_provinces = get_provinces_within_radius(
+        school_code, schools, provinces, radius_km
+    )
+    
+    # Lấy điểm chuẩn và combos các năm (4 năm trước target)
+    try:
+        scores = []
+        ratios = []
+        combos_list = []
+        
+        for offset in [1, 2, 3, 4]:
+            year = target_year - offset
+            score = row.get(f'score_{year}', np.nan)
+            combo = parse_subject_combos(row.get(f'combo_{year}', ''))
+            scores.append(score)
+            combos_list.append(combo)
+            
+            # Tính ratio cho năm này
+            if not pd.isna(score) and combo:
+                cutoff = floor_to_step(score)
+                ratio = calculate_competition_ratio(
+                    year, combo, cutoff, nearby_provinces, summaries
+                )
+            else:
+                ratio = np.nan
+            ratios.append(ratio)
+        
+        score_prev = scores[0]
+        if require_target:
+            score_target = row[f'score_{target_year}']
+        else:
+            score_target = row.get(f'score_{target_year}', np.nan)
+        
+    except KeyError:
+        return None
+    
+    if pd.isna(score_prev):
+        return None
+    
+    weighted_ratio = compute_weighted_ratio(ratios)
+    
+    # Lookup điểm từ weighted ratio trong năm target
+    target_combos = get_target_combos(row, target_year, combos_list[0])
+    
+    weighted_ratio_score = lookup_score_from_ratio(
+        target_year, target_combos, weighted_ratio, nearby_provinces, summaries
+    )
+    
+    return make_feature_record(
+        school_code, major_code, major_name, target_year,
+        scores, ratios, weighted_ratio, weighted_ratio_score, score_target
+    )
+
+
+def compute_weighted_ratio(ratios: List[float]) -> float:
+    """Trung bình trọng số (4, 3, 2, 1) của ratio 4 năm trước, bỏ qua năm thiếu."""
+    weights = [4, 3, 2, 1]  # Trọng số cho n-1, n-2, n-3, n-4
+    
+    valid_ratios = []
+    valid_weights = []
+    for r, w in zip(ratios, weights):
+        if not pd.isna(r):
+            valid_ratios.append(r)
+            valid_weights.append(w)
+    
+    if valid_ratios:
+        return sum(r * w for r, w in zip(valid_ratios, valid_weights)) / sum(valid_weights)
+    return np.nan
+
+
+def get_target_combos(row: pd.Series, target_year: int, fallback: List[str]) -> List[str]:
+    """Tổ hợp năm target, nếu trống thì dùng tổ hợp năm N-1."""
+    target_combos = parse_subject_combos(row.get(f'combo_{target_year}', ''))
+    if not target_combos:
+        target_combos = fallback  # Fallback to n-1 combos
+    return target_combos
+
+
+def make_feature_record(
+    school_code: str,
+    major_code: str,
+    major_name: str,
+    target_year: int,
+    scores: List[float],
+    ratios: List[float],
+    weighted_ratio: float,
+    weighted_ratio_score: float,
+    score_target: float
+) -> Dict:
+    """Gom điểm/ratio 4 năm trước thành 1 record features."""
+    score_prev, score_2y, score_3y, score_4y = scores
+    ratio_prev, ratio_2y, ratio_3y, ratio_4y = ratios
+    
+    return {
+        'school_code': school_code,
+        'major_code': major_code,
+        'major_name': major_name,
+        'target_year': target_year,
+        
+        # Score features từ các năm trước
+        'score_prev_year': score_prev,
+        'score_2year_ago': score_2y,
+        'score_3year_ago': score_3y,
+        'score_4year_ago': score_4y,
+        'score_trend': score_prev - score_2y if not pd.isna(score_2y) else 0,
+        'avg_score_3year': np.nanmean([score_prev, score_2y, score_3y]),
+        
+        # Ratio features từ các năm trước
+        'ratio_prev_year': ratio_prev,
+        'ratio_2year_ago': ratio_2y,
+        'ratio_3year_ago': ratio_3y,
+        'ratio_4year_ago': ratio_4y,
+        'ratio_trend': ratio_prev - ratio_2y if not pd.isna(ratio_2y) else 0,
+        
+        # NEW: Weighted ratio lookup score (dùng phổ điểm năm target)
+        'weighted_ratio': weighted_ratio,
+        'weighted_ratio_score': weighted_ratio_score,
+        
+        # Target
+        'score_target': score_target
+    }
+
+
+def finalize_features(
+    records: List[Dict],
+    require_target: bool = True,
+    fill_values: Dict[str, float] = None
+) -> pd.DataFrame:
+    """Gom records thành DataFrame, bỏ dòng thiếu target/điểm N-1 và điền missing."""
+    df = pd.DataFrame(records)
+    if df.empty:
+        return df
+    df[FEATURE_COLS] = df[FEATURE_COLS].astype('float64')
+    df = df.dropna(subset=['score_target', 'score_prev_year'] if require_target else ['score_prev_year'])
+    if fill_values is None:
+        fill_values = df.median(numeric_only=True)
+    df = df.fillna({c: v for c, v in dict(fill_values).items() if c != 'score_target'})
+    
+    return df
+
+
 def build_training_features(
     pretrain: pd.DataFrame,
     schools: pd.DataFrame,
     provinces: pd.DataFrame,
     summaries: Dict[int, pd.DataFrame],
     target_year: int,
-    radius_km: float = 500
+    radius_km: float = 500,
+    require_target: bool = True,
+    fill_values: Dict[str, float] = None
 ) -> pd.DataFrame:
     """
     Xây dựng dataset với features cho training/prediction.
     
     Args:
         target_year: Năm cần dự đoán (2023 cho train, 2024 cho test)
+        require_target: Bỏ các ngành chưa có điểm chuẩn năm target
+            (False khi dự đoán ngành mới)
+        fill_values: Giá trị điền missing (mặc định: median của chính dataset)
     
     Features:
         - score_(target-1..4): Điểm chuẩn 4 năm trước
@@ -248,112 +422,169 @@ def build_training_features(
         - weighted_ratio_score: Điểm lookup từ weighted ratio trong năm target
     """
     records = []
-    weights = [4, 3, 2, 1]  # Trọng số cho n-1, n-2, n-3, n-4
-    
     for _, row in pretrain.iterrows():
-        school_code = row['school_code']
-        major_code = row['major_code']
-        major_name = row['major_name']
-        
-        # Lấy danh sách tỉnh trong bán kính
-        nearby_provinces = get_provinces_within_radius(
-            school_code, schools, provinces, radius_km
+        record = build_feature_record(
+            row, schools, provinces, summaries, target_year, radius_km, require_target
         )
-        
-        # Lấy điểm chuẩn và combos các năm (4 năm trước target)
-        try:
-            scores = []
-            ratios = []
-            combos_list = []
-            
-            for offset in [1, 2, 3, 4]:
-                year = target_year - offset
-                score = row.get(f'score_{year}', np.nan)
-                combo = parse_subject_combos(row.get(f'combo_{year}', ''))
-                scores.append(score)
-                combos_list.append(combo)
-                
-                # Tính ratio cho năm này
-                if not pd.isna(score) and combo:
-                    cutoff = floor_to_step(score)
-                    ratio = calculate_competition_ratio(
-                        year, combo, cutoff, nearby_provinces, summaries
-                    )
-                else:
-                    ratio = np.nan
-                ratios.append(ratio)
-            
-            score_prev, score_2y, score_3y, score_4y = scores
-            ratio_prev, ratio_2y, ratio_3y, ratio_4y = ratios
-            score_target = row[f'score_{target_year}']
-            
-        except KeyError:
-            continue
-        
-        if pd.isna(score_prev):
-            continue
-        
-        # Tính weighted ratio
-        valid_ratios = []
-        valid_weights = []
-        for r, w in zip(ratios, weights):
-            if not pd.isna(r):
-                valid_ratios.append(r)
-                valid_weights.append(w)
-        
-        if valid_ratios:
-            weighted_ratio = sum(r * w for r, w in zip(valid_ratios, valid_weights)) / sum(valid_weights)
+        if record is not None:
+            records.append(record)
+    
+    return finalize_features(records, require_target, fill_values)
+
+
+# =============================================================================
+# 6. FEATURE STORE
+# =============================================================================
+
+STORE_ID_COLS = ['school_code', 'major_code', 'major_name']
+
+# Tăng mỗi khi đổi logic tính features (ratio, lookup, fill...) để store cũ không bị dùng lại
+FEATURE_VERSION = 1
+
+
+def feature_code_digest() -> str:
+    """Digest của FEATURE_VERSION + FEATURE_COLS (1 phần store key)."""
+    payload = f"{FEATURE_VERSION}|{','.join(FEATURE_COLS)}".encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:8]
+
+
+def file_sha256(path: str) -> str:
+    """SHA-256 của 1 file (đọc theo chunk)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _frame_digest(df: pd.DataFrame) -> str:
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def _summary_digests(summaries: Dict[int, pd.DataFrame]) -> Dict[Tuple[int, str], str]:
+    """Digest phổ điểm theo từng (năm, tổ hợp) để biết ngành nào bị ảnh hưởng khi summary đổi."""
+    digests = {}
+    for year, summary in summaries.items():
+        ordered = summary.sort_values(['subject_combo', 'province_code', 'score_threshold'], kind='mergesort')
+        row_hashes = pd.util.hash_pandas_object(ordered, index=False).values
+        combos = ordered['subject_combo'].values
+        bounds = np.flatnonzero(combos[1:] != combos[:-1]) + 1
+        for chunk_combos, chunk_hashes in zip(np.split(combos, bounds), np.split(row_hashes, bounds)):
+            if len(chunk_combos):
+                digests[(year, chunk_combos[0])] = hashlib.sha256(chunk_hashes.tobytes()).hexdigest()
+    return digests
+
+
+def _row_signatures(
+    pretrain: pd.DataFrame,
+    summary_digests: Dict[Tuple[int, str], str],
+    target_year: int
+) -> List[str]:
+    """
+    Signature của từng ngành = nội dung dòng pretrain (các năm target-4..target)
+    + digest phổ điểm của mọi (năm, tổ hợp) mà ngành dùng.
+    """
+    years = list(range(target_year - 4, target_year + 1))
+    cols = STORE_ID_COLS + [
+        c for y in years for c in (f'combo_{y}', f'score_{y}') if c in pretrain.columns
+    ]
+    row_hashes = pd.util.hash_pandas_object(pretrain[cols], index=False).values
+    
+    combo_cols = [f'combo_{y}' for y in years if f'combo_{y}' in pretrain.columns]
+    signatures = []
+    for row_hash, combo_values in zip(row_hashes, pretrain[combo_cols].itertuples(index=False)):
+        combos = set()
+        for value in combo_values:
+            combos.update(parse_subject_combos(value))
+        deps = [
+            summary_digests.get((y, c), '-')
+            for y in years for c in sorted(combos)
+        ]
+        payload = f"{row_hash}|{'|'.join(deps)}".encode('utf-8')
+        signatures.append(hashlib.sha1(payload).hexdigest())
+    return signatures
+
+
+def load_or_build_features(
+    pretrain: pd.DataFrame,
+    schools: pd.DataFrame,
+    provinces: pd.DataFrame,
+    summaries: Dict[int, pd.DataFrame],
+    target_year: int,
+    radius_km: float = 500,
+    store_dir: str = None
+) -> pd.DataFrame:
+    """
+    Giống build_training_features nhưng dùng feature store (Parquet) trong data/feature_store/.
+    
+    - Store key: (target_year, radius_km, hash tọa độ trường + tỉnh,
+                  FEATURE_VERSION + hash FEATURE_COLS)
+    - Mỗi dòng lưu kèm signature (nội dung ngành + digest phổ điểm các năm liên quan)
+    - Chỉ tính lại các ngành có signature mới; ngành không đổi đọc lại từ store
+    """
+    if store_dir is None:
+        store_dir = os.path.join(DATA_DIR, 'feature_store')
+    os.makedirs(store_dir, exist_ok=True)
+    
+    geo_digest = hashlib.sha256((
+        _frame_digest(schools[['MA_TRUONG', 'VI_DO', 'KINH_DO']]) +
+        _frame_digest(provinces[['MA_TINH', 'VI_DO', 'KINH_DO']])
+    ).encode('utf-8')).hexdigest()
+    store_path = os.path.join(
+        store_dir,
+        f'features_{target_year}_r{radius_km:g}_{geo_digest[:12]}'
+        f'_v{FEATURE_VERSION}_{feature_code_digest()}.parquet'
+    )
+    
+    signatures = _row_signatures(pretrain, _summary_digests(summaries), target_year)
+    
+    stored = {}
+    if os.path.exists(store_path):
+        stored_df = pd.read_parquet(store_path)
+        stored = {
+            sig: rec for sig, rec in zip(
+                stored_df['_row_sig'], stored_df.drop(columns='_row_sig').to_dict('records')
+            )
+        }
+    
+    value_cols = FEATURE_COLS + ['score_target']
+    records, store_rows = [], {}
+    n_computed = 0
+    for sig, (_, row) in zip(signatures, pretrain.iterrows()):
+        if sig in stored:
+            values = stored[sig]
         else:
-            weighted_ratio = np.nan
+            record = build_feature_record(
+                row, schools, provinces, summaries, target_year, radius_km, require_target=True
+            )
+            n_computed += 1
+            values = {'_has_record': record is not None}
+            values.update({c: (record[c] if record else np.nan) for c in value_cols})
+        store_rows[sig] = values
         
-        # Lookup điểm từ weighted ratio trong năm target
-        target_combos = parse_subject_combos(row.get(f'combo_{target_year}', ''))
-        if not target_combos:
-            target_combos = combos_list[0]  # Fallback to n-1 combos
-        
-        weighted_ratio_score = lookup_score_from_ratio(
-            target_year, target_combos, weighted_ratio, nearby_provinces, summaries
+        if values['_has_record']:
+            record = {c: row[c] for c in STORE_ID_COLS}
+            record['target_year'] = target_year
+            record.update({c: values[c] for c in value_cols})
+            records.append(record)
+    
+    print(f"  Feature store {os.path.basename(store_path)}: "
+          f"{len(signatures) - n_computed} reused, {n_computed} computed")
+    
+    if n_computed or len(store_rows) != len(stored):
+        store_df = pd.DataFrame.from_dict(store_rows, orient='index')
+        store_df.index.name = '_row_sig'
+        store_df = store_df.reset_index().astype(
+            {'_row_sig': 'string', '_has_record': 'bool', **{c: 'float64' for c in value_cols}}
         )
-        
-        record = {
-            'school_code': school_code,
-            'major_code': major_code,
-            'major_name': major_name,
-            'target_year': target_year,
-            
-            # Score features từ các năm trước
-            'score_prev_year': score_prev,
-            'score_2year_ago': score_2y,
-            'score_3year_ago': score_3y,
-            'score_4year_ago': score_4y,
-            'score_trend': score_prev - score_2y if not pd.isna(score_2y) else 0,
-            'avg_score_3year': np.nanmean([score_prev, score_2y, score_3y]),
-            
-            # Ratio features từ các năm trước
-            'ratio_prev_year': ratio_prev,
-            'ratio_2year_ago': ratio_2y,
-            'ratio_3year_ago': ratio_3y,
-            'ratio_4year_ago': ratio_4y,
-            'ratio_trend': ratio_prev - ratio_2y if not pd.isna(ratio_2y) else 0,
-            
-            # NEW: Weighted ratio lookup score (dùng phổ điểm năm target)
-            'weighted_ratio': weighted_ratio,
-            'weighted_ratio_score': weighted_ratio_score,
-            
-            # Target
-            'score_target': score_target
-        }
-        records.append(record)
-    
-    df = pd.DataFrame(records)
-    df = df.dropna(subset=['score_target', 'score_prev_year'])
-    df = df.fillna(df.median(numeric_only=True))
+        store_df.to_parquet(store_path, index=False)
     
-    return df
+    return finalize_features(records)
 
 
 # =============================================================================
-# 6. MODEL TRAINING & EVALUATION
+# 7. MODEL TRAINING & EVALUATION
 # =============================================================================
 
 FEATURE_COLS = [
@@ -363,6 +594,44 @@ FEATURE_COLS = [
     'weighted_ratio', 'weighted_ratio_score'  # NEW: Feature từ phổ điểm năm target
 ]
 
+# Họ model + hyperparameter mặc định. Model tuyến tính ('Regression' trong tên)
+# được train trên features đã scale.
+MODEL_FAMILIES = {
+    'Linear Regression': (LinearRegression, {}),
+    'Ridge Regression': (Ridge, {'alpha': 1.0}),
+    'Lasso Regression': (Lasso, {'alpha': 0.1}),
+    'Random Forest': (RandomForestRegressor, {'n_estimators': 100, 'random_state': 42}),
+    'Gradient Boosting': (GradientBoostingRegressor, {'n_estimators': 100, 'random_state': 42}),
+    'XGBoost': (None, {'n_estimators': 100, 'random_state': 42, 'verbosity': 0}),
+}
+
+
+def available_model_names() -> List[str]:
+    """Danh sách họ model dùng được (XGBoost chỉ có khi đã cài xgboost)."""
+    names = list(MODEL_FAMILIES)
+    try:
+        import xgboost  # noqa: F401
+    except ImportError:
+        names.remove('XGBoost')
+    return names
+
+
+def build_model(model_name: str, params: Dict = None):
+    """
+    Tạo model chưa train từ tên họ model + hyperparameter.
+    
+    params ghi đè lên hyperparameter mặc định trong MODEL_FAMILIES.
+    """
+    if model_name not in MODEL_FAMILIES:
+        raise ValueError(f"Không hỗ trợ model: {model_name}")
+    
+    model_cls, default_params = MODEL_FAMILIES[model_name]
+    if model_name == 'XGBoost':
+        from xgboost import XGBRegressor
+        model_cls = XGBRegressor
+    
+    return model_cls(**{**default_params, **(params or {})})
+
 
 def train_and_evaluate_models(
     df_train: pd.DataFrame,
@@ -382,19 +651,7 @@ def train_and_evaluate_models(
     X_valid_scaled = scaler.transform(X_valid)
     
     # Define models
-    models = {
-        'Linear Regression': LinearRegression(),
-        'Ridge Regression': Ridge(alpha=1.0),
-        'Lasso Regression': Lasso(alpha=0.1),
-        'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
-        'Gradient Boosting': GradientBoostingRegressor(n_estimators=100, random_state=42),
-    }
-    
-    try:
-        from xgboost import XGBRegressor
-        models['XGBoost'] = XGBRegressor(n_estimators=100, random_state=42, verbosity=0)
-    except ImportError:
-        pass
+    models = {name: build_model(name) for name in available_model_names()}
     
     results = {}
     best_score = -float('inf')
@@ -437,6 +694,7 @@ def train_and_evaluate_models(
         'results': results,
         'best_model': best_model,
         'best_model_name': best_model_name,
+        'best_params': dict(MODEL_FAMILIES[best_model_name][1]),
         'scaler': scaler,
         'X_train': X_train,
         'y_train': y_train
@@ -452,21 +710,11 @@ def retrain_best_model_on_full_data(model_info: Dict, df_full: pd.DataFrame) ->
     X_full_scaled = scaler.fit_transform(X_full)
     
     best_model_name = model_info['best_model_name']
+    best_params = model_info.get('best_params')
     
     # Recreate model
-    if best_model_name == 'Linear Regression':
-        model = LinearRegression()
-    elif best_model_name == 'Ridge Regression':
-        model = Ridge(alpha=1.0)
-    elif best_model_name == 'Lasso Regression':
-        model = Lasso(alpha=0.1)
-    elif best_model_name == 'Random Forest':
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
-    elif best_model_name == 'Gradient Boosting':
-        model = GradientBoostingRegressor(n_estimators=100, random_state=42)
-    elif best_model_name == 'XGBoost':
-        from xgboost import XGBRegressor
-        model = XGBRegressor(n_estimators=100, random_state=42, verbosity=0)
+    if best_model_name in MODEL_FAMILIES:
+        model = build_model(best_model_name, best_params)
     else:
         model = model_info['best_model']
     
@@ -480,12 +728,26 @@ def retrain_best_model_on_full_data(model_info: Dict, df_full: pd.DataFrame) ->
     return {
         'best_model': model,
         'best_model_name': best_model_name,
+        'best_params': best_params,
         'scaler': scaler
     }
 
 
+def load_search_spec(spec_path: str = None) -> Optional[Dict]:
+    """Spec model tốt nhất do model_search lưu (None nếu chưa chạy search)."""
+    try:
+        from model_search import SPEC_PATH, load_model_spec
+    except ImportError:
+        from src.model_search import SPEC_PATH, load_model_spec
+    
+    path = spec_path or SPEC_PATH
+    if not os.path.exists(path):
+        return None
+    return load_model_spec(path)
+
+
 # =============================================================================
-# 7. PREDICTION
+# 8. PREDICTION
 # =============================================================================
 
 def predict_scores(df_test: pd.DataFrame, model_info: Dict) -> pd.DataFrame:
@@ -510,15 +772,140 @@ def predict_scores(df_test: pd.DataFrame, model_info: Dict) -> pd.DataFrame:
 
 
 # =============================================================================
-# 8. MAIN
+# 9. MODEL ARTIFACT
 # =============================================================================
 
-def main():
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def hash_training_data(df: pd.DataFrame) -> str:
+    """SHA-256 của features + target dùng để train (để biết model train trên dữ liệu nào)."""
+    cols = FEATURE_COLS + ['score_target']
+    row_hashes = pd.util.hash_pandas_object(df[cols], index=False).values
+    return hashlib.sha256(row_hashes.tobytes()).hexdigest()
+
+
+def save_model_artifact(
+    model_info: Dict,
+    df_train: pd.DataFrame,
+    metrics: Dict[str, Dict[str, float]],
+    predict_year: int,
+    radius_km: float = 500,
+    path: str = None
+) -> str:
+    """
+    Lưu model + scaler + FEATURE_COLS + hash dữ liệu train + metrics ra 1 file.
+    
+    Mặc định lưu vào models/admission_model_<version>.joblib, version = thời điểm train.
+    """
+    version = datetime.now().strftime('%Y%m%d_%H%M%S')
+    if path is None:
+        os.makedirs(MODEL_DIR, exist_ok=True)
+        path = os.path.join(MODEL_DIR, f'admission_model_{version}.joblib')
+    
+    artifact = {
+        'format_version': ARTIFACT_FORMAT_VERSION,
+        'version': version,
+        'best_model': model_info['best_model'],
+        'best_model_name': model_info['best_model_name'],
+        'best_params': model_info.get('best_params'),
+        'scaler': model_info['scaler'],
+        'feature_cols': list(FEATURE_COLS),
+        'fill_values': df_train[FEATURE_COLS].median().to_dict(),
+        'train_data_hash': hash_training_data(df_train),
+        'n_train': len(df_train),
+        'metrics': metrics,
+        'predict_year': predict_year,
+        'radius_km': radius_km,
+    }
+    joblib.dump(artifact, path)
+    print(f"Model artifact saved to: {path}")
+    return path
+
+
+def load_model_artifact(path: str = None) -> Dict:
+    """Load artifact (mặc định: bản mới nhất trong models/)."""
+    if path is None:
+        candidates = sorted(
+            f for f in os.listdir(MODEL_DIR)
+            if f.startswith('admission_model_') and f.endswith('.joblib')
+        ) if os.path.isdir(MODEL_DIR) else []
+        if not candidates:
+            raise FileNotFoundError(f"Không tìm thấy model artifact trong {MODEL_DIR}")
+        path = os.path.join(MODEL_DIR, candidates[-1])
+    
+    artifact = joblib.load(path)
+    if artifact.get('format_version') != ARTIFACT_FORMAT_VERSION:
+        raise ValueError(f"Artifact {path} có format_version không hỗ trợ: {artifact.get('format_version')}")
+    if artifact['feature_cols'] != FEATURE_COLS:
+        raise ValueError(f"Artifact {path} được train với bộ features khác FEATURE_COLS hiện tại")
+    return artifact
+
+
+def predict_with_artifact(artifact: Dict, df_features: pd.DataFrame) -> pd.DataFrame:
+    """Dự đoán cho toàn bộ df_features trong 1 lần gọi model."""
+    X = df_features[artifact['feature_cols']].fillna(artifact['fill_values']).values
+    if 'Regression' in artifact['best_model_name']:
+        X = artifact['scaler'].transform(X)
+    
+    id_cols = [c for c in ['school_code', 'major_code', 'major_name'] if c in df_features.columns]
+    result = df_features[id_cols].copy()
+    if 'score_target' in df_features.columns:
+        result['actual'] = df_features['score_target']
+    result['predicted'] = artifact['best_model'].predict(X)
+    return result
+
+
+def predict_pairs(
+    artifact: Dict,
+    pairs: List[Tuple[str, str]],
+    data: Tuple = None
+) -> pd.DataFrame:
+    """
+    Dự đoán cho danh sách (mã trường, mã ngành) mà không cần train lại.
+    
+    Features được build từ data_pretrain_filled.csv cho năm artifact['predict_year'].
+    """
+    schools, provinces, pretrain, summaries = data if data is not None else load_data()
+    
+    keys = pd.MultiIndex.from_tuples([(str(sc), str(mc)) for sc, mc in pairs])
+    pretrain_keys = pd.MultiIndex.from_arrays([
+        pretrain['school_code'].astype(str), pretrain['major_code'].astype(str)
+    ])
+    selected = pretrain[pretrain_keys.isin(keys)]
+    
+    missing = set(keys) - set(pretrain_keys[pretrain_keys.isin(keys)])
+    if missing:
+        print(f"⚠️ Không tìm thấy {len(missing)} ngành trong data_pretrain_filled.csv: {sorted(missing)}")
+    
+    df_features = build_training_features(
+        selected, schools, provinces, summaries,
+        target_year=artifact['predict_year'], radius_km=artifact['radius_km'],
+        require_target=False, fill_values=artifact['fill_values']
+    )
+    if df_features.empty:
+        return pd.DataFrame(columns=['school_code', 'major_code', 'major_name', 'predicted'])
+    return predict_with_artifact(artifact, df_features)
+
+
+# =============================================================================
+# 10. MAIN
+# =============================================================================
+
+def main(save_artifact: bool = True, spec_path: str = None):
     print("=" * 60)
     print("DỰ ĐOÁN ĐIỂM CHUẨN ĐẠI HỌC 2024")
     print("Time-based Split: Train/Valid on 2023, Test on 2024")
     print("=" * 60)
     
+    # Spec từ model_search (nếu có) không được chọn trên năm test
+    spec = load_search_spec(spec_path)
+    if spec is not None and TEST_YEAR in spec['cv'].get('valid_years', []):
+        raise ValueError(
+            f"Spec {spec_path or 'best_model_spec.json'} được chọn với fold valid {TEST_YEAR} "
+            f"(năm test hold-out). Chạy lại model_search không dùng {TEST_YEAR} làm valid."
+        )
+    
     print("\nLoading data...")
     schools, provinces, pretrain, summaries = load_data()
     
@@ -535,7 +922,7 @@ def main():
     print("=" * 60)
     
     print("\nBuilding features for target_year=2023...")
-    df_2023 = build_training_features(
+    df_2023 = load_or_build_features(
         pretrain, schools, provinces, summaries,
         target_year=2023, radius_km=500
     )
@@ -558,8 +945,18 @@ def main():
     # Train and evaluate
     model_info = train_and_evaluate_models(df_train, df_valid)
     
-    # Retrain on full 2023 data
-    model_info_full = retrain_best_model_on_full_data(model_info, df_2023)
+    # Retrain on full 2023 data: ưu tiên spec từ model_search nếu đã có
+    if spec is not None:
+        try:
+            from model_search import refit_from_spec
+        except ImportError:
+            from src.model_search import refit_from_spec
+        print(f"\nUsing search spec: {spec['model']} {spec['params']} (CV {spec['cv']})")
+        if spec.get('radius_km', 500) != 500:
+            print(f"⚠️ Spec được search với radius_km={spec['radius_km']}, features ở đây dùng 500")
+        model_info_full = refit_from_spec(spec, df_2023)
+    else:
+        model_info_full = retrain_best_model_on_full_data(model_info, df_2023)
     
     # =========================================================================
     # PHASE 2: Prediction (target = 2024)
@@ -570,7 +967,7 @@ def main():
     print("=" * 60)
     
     print("\nBuilding features for target_year=2024...")
-    df_2024 = build_training_features(
+    df_2024 = load_or_build_features(
         pretrain, schools, provinces, summaries,
         target_year=2024, radius_km=500
     )
@@ -629,11 +1026,75 @@ def main():
     print("SUMMARY")
     print("=" * 60)
     print(f"Best Model: {model_info_full['best_model_name']}")
-    print(f"Validation R² (2023): {model_info['results'][model_info['best_model_name']]['R2']:.4f}")
+    if spec is not None:
+        print(f"CV R² (spec, valid {spec['cv']['valid_years']}): {spec['cv']['R2']:.4f}")
+    else:
+        print(f"Validation R² (2023): {model_info['results'][model_info['best_model_name']]['R2']:.4f}")
     print(f"Test R² (2024): {r2:.4f}")
     
+    if save_artifact:
+        if spec is not None:
+            valid_metrics = {'cv': {k: float(spec['cv'][k]) for k in ['MAE', 'RMSE', 'R2']}}
+        else:
+            best_valid = model_info['results'][model_info['best_model_name']]
+            valid_metrics = {'valid_2023': {k: float(best_valid[k]) for k in ['MAE', 'RMSE', 'R2']}}
+        save_model_artifact(
+            model_info_full, df_2023,
+            metrics={
+                **valid_metrics,
+                'test_2024': {'MAE': float(mae), 'RMSE': float(rmse), 'R2': float(r2)},
+            },
+            predict_year=2024, radius_km=500
+        )
+    
     return predictions, model_info_full
 
 
+def predict_cli(argv: List[str] = None) -> pd.DataFrame:
+    """
+    Dự đoán từ model artifact đã lưu, không train lại.
+    
+    Usage:
+        python src/predict_admission_score.py predict --features data/training_features_2024.csv
+        python src/predict_admission_score.py predict --pairs BKA:7480201 KHA:7340101
+    """
+    parser = argparse.ArgumentParser(prog='predict_admission_score.py predict')
+    parser.add_argument('--model', default=None, help='Đường dẫn artifact (mặc định: bản mới nhất)')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--features', help='CSV chứa sẵn FEATURE_COLS')
+    source.add_argument('--pairs', nargs='+', metavar='MA_TRUONG:MA_NGANH',
+                        help='Danh sách ngành cần dự đoán')
+    parser.add_argument('--output', default=None, help='CSV kết quả (mặc định: in ra màn hình)')
+    args = parser.parse_args(argv)
+    
+    pairs = []
+    for p in args.pairs or []:
+        school_code, sep, major_code = p.partition(':')
+        if not sep or not school_code or not major_code:
+            parser.error(f"--pairs: '{p}' sai định dạng, cần SCHOOL:MAJOR (vd BKA:7480201)")
+        pairs.append((school_code, major_code))
+    
+    artifact = load_model_artifact(args.model)
+    print(f"Model: {artifact['best_model_name']} (version {artifact['version']}, "
+          f"train hash {artifact['train_data_hash'][:12]})")
+    
+    if args.features:
+        df_features = pd.read_csv(args.features, encoding='utf-8-sig')
+        result = predict_with_artifact(artifact, df_features)
+    else:
+        result = predict_pairs(artifact, pairs)
+    
+    if args.output:
+        result.to_csv(args.output, index=False, encoding='utf-8-sig')
+        print(f"Predictions saved to: {args.output}")
+    else:
+        print(result.to_string())
+    
+    return result
+
+
 if __name__ == '__main__':
-    predictions, model_info = main()
+    if len(sys.argv) > 1 and sys.argv[1] == 'predict':
+        predict_cli(sys.argv[2:])
+    else:
+        predictions, model_info = main()
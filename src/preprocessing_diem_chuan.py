@@ -3,6 +3,7 @@ from __future__ import annotations
 from pathlib import Path
 from typing import Dict, Tuple, Optional, List
 
+import numpy as np
 import pandas as pd
 
 
@@ -16,6 +17,66 @@ SRC_DIR = Path(__file__).resolve().parent
 BASE_DIR = SRC_DIR.parent
 
 
+# ==========================
+# Bitmask tổ hợp môn
+# ==========================
+
+def encode_combo_bits(combos: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Mã hóa mỗi chuỗi Tổ hợp môn (đã strip) thành 1 bit.
+
+    Bit được đánh theo thứ tự chuỗi tăng dần, nên duyệt bit từ thấp lên cao
+    cho ra các chuỗi đã sắp xếp (giống sorted(set(...))).
+
+    Returns:
+        codes: vị trí bit của từng dòng (-1 nếu NaN)
+        uniques: các chuỗi tổ hợp, uniques[code] là chuỗi của bit code
+    """
+    codes = np.full(len(combos), -1, dtype=np.int64)
+    valid = combos.notna().to_numpy()
+    codes[valid], uniques = pd.factorize(combos[valid].astype(str).str.strip(), sort=True)
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def union_combo_masks(group_ids: np.ndarray, codes: np.ndarray, n_groups: int, n_bits: int) -> np.ndarray:
+    """
+    OR các bit tổ hợp theo nhóm.
+
+    Returns:
+        Mảng uint64 (n_groups × số word 64 bit), mỗi dòng là hợp các tổ hợp của nhóm
+    """
+    n_words = max(1, (n_bits + 63) // 64)
+    masks = np.zeros((n_groups, n_words), dtype=np.uint64)
+    ok = (group_ids >= 0) & (codes >= 0)
+    bits = np.left_shift(np.uint64(1), (codes[ok] % 64).astype(np.uint64))
+    np.bitwise_or.at(masks, (group_ids[ok], codes[ok] // 64), bits)
+    return masks
+
+
+def factorize_masks(masks: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Đánh id cho các bitmask (mỗi dòng 1 mask), nhanh hơn np.unique(axis=0).
+
+    Mỗi dòng được xem như 1 chuỗi bytes độ dài cố định rồi pd.factorize
+    (dtype 'S' bỏ byte 0 ở cuối nhưng vẫn 1-1 vì độ dài cố định).
+
+    Returns:
+        ids: id mask của từng dòng
+        distinct: các mask phân biệt, distinct[ids] == masks
+    """
+    keys = np.ascontiguousarray(masks).view(f"S{masks.shape[1] * 8}").ravel()
+    ids, uniques = pd.factorize(keys)
+    first = np.zeros(len(uniques), dtype=np.int64)
+    first[ids[::-1]] = np.arange(len(ids))[::-1]
+    return ids, masks[first]
+
+
+def decode_combo_masks(masks: np.ndarray, uniques: np.ndarray, sep: str = "; ") -> List[str]:
+    """Bitmask (n × word) -> chuỗi tổ hợp nối bằng sep, theo thứ tự bit."""
+    bits = np.unpackbits(masks.view(np.uint8), axis=1, bitorder="little")
+    return [sep.join(uniques[np.flatnonzero(row)]) for row in bits]
+
+
 # ==========================
 # Hàm chính: build bảng ngành wide
 # ==========================
@@ -67,34 +128,44 @@ def build_nganh_training_dataset(
         )
 
     base_cols = ["Mã trường", "Mã ngành", "Tên ngành"]
+    group_cols = base_cols + ["Năm xét tuyển"]
 
     # Gộp trước theo (Mã trường, Mã ngành, Tên ngành, Năm xét tuyển)
     # để đảm bảo mỗi (ngành, năm) là 1 record duy nhất.
-    grouped = (
-        df.groupby(base_cols + ["Năm xét tuyển"], as_index=False)
-        .agg({
-            # Nếu 1 ngành-năm có nhiều tổ hợp -> nối lại bằng '; '
-            "Tổ hợp môn": lambda x: "; ".join(sorted({str(v).strip() for v in x if pd.notna(v)})),
-            # Điểm chuẩn: chọn max (có thể đổi thành 'first' nếu bạn muốn)
-            "Điểm chuẩn": "max",
-        })
-    )
-
-    # Pivot sang dạng wide
-    pivot = grouped.pivot_table(
-        index=base_cols,
-        columns="Năm xét tuyển",
-        values=["Tổ hợp môn", "Điểm chuẩn"],
-        aggfunc="first",  # sau groupby mỗi ô đã unique
-    )
-
-    # Làm phẳng MultiIndex columns -> "Tổ hợp môn năm 2019", "Điểm chuẩn năm 2019", ...
-    pivot.columns = [
-        f"{col_name} năm {int(year)}"
-        for col_name, year in pivot.columns
-    ]
-
-    pivot = pivot.reset_index()
+    groups = df.groupby(group_cols)
+    # Dòng có khóa NaN bị groupby bỏ qua -> -1
+    group_ids = groups.ngroup().fillna(-1).to_numpy(dtype=np.int64)
+
+    # Điểm chuẩn: chọn max (có thể đổi thành 'first' nếu bạn muốn)
+    scores = groups["Điểm chuẩn"].max()
+
+    # Nếu 1 ngành-năm có nhiều tổ hợp -> hợp các bit tổ hợp (OR),
+    # chỉ giải mã thành chuỗi '; ' khi ghi file
+    codes, uniques = encode_combo_bits(df["Tổ hợp môn"])
+    masks = union_combo_masks(group_ids, codes, len(scores), len(uniques))
+    mask_ids, distinct_masks = factorize_masks(masks)
+    mask_ids = pd.Series(mask_ids, index=scores.index)
+
+    # Trải sang dạng wide theo năm (ô không có dữ liệu: mask_id = -1).
+    # unstack không luôn giữ thứ tự đã sắp của groupby -> reindex lại theo khóa
+    row_order = scores.index.droplevel("Năm xét tuyển").unique()
+    wide_ids = mask_ids.unstack("Năm xét tuyển", fill_value=-1).reindex(row_order)
+    wide_scores = scores.unstack("Năm xét tuyển").reindex(row_order)
+
+    # Giải mã: -1 trỏ tới phần tử cuối (NaN)
+    combo_lookup = np.array(decode_combo_masks(distinct_masks, uniques) + [np.nan], dtype=object)
+
+    pivot = pd.concat(
+        [
+            pd.DataFrame(
+                combo_lookup[wide_ids.to_numpy()],
+                index=wide_ids.index,
+                columns=[f"Tổ hợp môn năm {int(y)}" for y in wide_ids.columns],
+            ),
+            wide_scores.set_axis([f"Điểm chuẩn năm {int(y)}" for y in wide_scores.columns], axis=1),
+        ],
+        axis=1,
+    ).reset_index()
 
     # Đảm bảo có đủ cột cho mọi năm trong [year_from, year_to]
     expected_years: List[int] = list(range(year_from, year_to + 1))
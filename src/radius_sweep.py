@@ -0,0 +1,312 @@
+"""
+Đánh giá độ nhạy của bán kính vùng cạnh tranh (radius_km).
+
+Thay vì chạy lại build_training_features cho từng bán kính, mỗi trường chỉ
+sắp xếp khoảng cách đến các tỉnh 1 lần. Với 1 ngành + 1 năm, số thí sinh theo
+tỉnh được cộng dồn (cumsum) theo thứ tự tỉnh gần → xa, nên bán kính lớn hơn
+chỉ là lấy thêm phần tử của mảng cộng dồn. Toàn bộ bán kính được tính trong 1 lượt.
+
+Output: bảng metrics validation (target 2023) và test (target 2024) theo bán kính.
+"""
+
+import os
+from typing import List, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.preprocessing import StandardScaler
+
+try:
+    from predict_admission_score import (
+        DATA_DIR, FEATURE_COLS,
+        build_model, compute_weighted_ratio, finalize_features, floor_to_step,
+        get_target_combos, haversine_distance, load_data, make_feature_record,
+        parse_subject_combos,
+    )
+except ImportError:
+    from src.predict_admission_score import (
+        DATA_DIR, FEATURE_COLS,
+        build_model, compute_weighted_ratio, finalize_features, floor_to_step,
+        get_target_combos, haversine_distance, load_data, make_feature_record,
+        parse_subject_combos,
+    )
+
+
+DEFAULT_RADII = list(range(100, 1501, 100))
+BASE_SCORE = 12.5
+
+
+# =============================================================================
+# 1. KHOẢNG CÁCH TRƯỜNG → TỈNH
+# =============================================================================
+
+class ProvinceOrder:
+    """Thứ tự tỉnh gần → xa của từng trường + số tỉnh nằm trong mỗi bán kính."""
+
+    def __init__(self, schools: pd.DataFrame, provinces: pd.DataFrame, radii: List[float]):
+        self.province_codes = provinces['MA_TINH'].astype(str).str.zfill(2).tolist()
+        self.radii = np.asarray(radii, dtype=float)
+        self._schools = schools
+        self._provinces = provinces
+        self._cache = {}
+
+    def get(self, school_code: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns:
+            order: index tỉnh sắp theo khoảng cách tăng dần
+            counts: số tỉnh trong bán kính, tương ứng với self.radii
+        """
+        if school_code in self._cache:
+            return self._cache[school_code]
+
+        n = len(self.province_codes)
+        school_row = self._schools[self._schools['MA_TRUONG'] == school_code]
+        if school_row.empty:
+            # Giống get_provinces_within_radius: không có tọa độ → toàn bộ tỉnh
+            result = (np.arange(n), np.full(len(self.radii), n))
+        else:
+            school_lat = school_row['VI_DO'].iloc[0]
+            school_lon = school_row['KINH_DO'].iloc[0]
+            dists = np.array([
+                haversine_distance(school_lat, school_lon, lat, lon)
+                for lat, lon in zip(self._provinces['VI_DO'], self._provinces['KINH_DO'])
+            ])
+            order = np.argsort(dists, kind='stable')
+            counts = np.searchsorted(dists[order], self.radii, side='right')
+            result = (order, counts)
+
+        self._cache[school_code] = result
+        return result
+
+
+# =============================================================================
+# 2. PHỔ ĐIỂM DẠNG TENSOR (TỔ HỢP × TỈNH × MỐC ĐIỂM)
+# =============================================================================
+
+class SummaryTensor:
+    """
+    Phổ điểm 1 năm dưới dạng mảng [tổ hợp, tỉnh, mốc điểm].
+
+    - students: tổng số thí sinh
+    - rows: số dòng summary (để phân biệt "không có dữ liệu" với "0 thí sinh")
+    """
+
+    def __init__(self, summary: pd.DataFrame, province_codes: List[str]):
+        prov_index = {code: i for i, code in enumerate(province_codes)}
+        df = summary[summary['province_code'].isin(prov_index)]
+
+        self.combos = {c: i for i, c in enumerate(sorted(df['subject_combo'].unique()))}
+        self.thresholds = np.sort(df['score_threshold'].unique())
+
+        c_idx = df['subject_combo'].map(self.combos).values
+        p_idx = df['province_code'].map(prov_index).values
+        t_idx = np.searchsorted(self.thresholds, df['score_threshold'].values)
+
+        shape = (len(self.combos), len(province_codes), len(self.thresholds))
+        self.students = np.zeros(shape)
+        self.rows = np.zeros(shape, dtype=np.int64)
+        np.add.at(self.students, (c_idx, p_idx, t_idx), df['num_students'].values)
+        np.add.at(self.rows, (c_idx, p_idx, t_idx), 1)
+
+    def combo_indices(self, combos: List[str]) -> List[int]:
+        return [self.combos[c] for c in set(combos) if c in self.combos]
+
+    def threshold_index(self, score: float) -> int:
+        """Index của mốc điểm == score (so sánh bằng như calculate_competition_ratio), -1 nếu không có."""
+        hits = np.flatnonzero(self.thresholds == score)
+        return int(hits[0]) if len(hits) else -1
+
+
+def _cumulative_at(values: np.ndarray, order: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Tổng theo tỉnh trong từng bán kính: cộng dồn theo thứ tự gần → xa rồi lấy tại counts."""
+    cum = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values[order], axis=0)])
+    return cum[counts]
+
+
+def sweep_ratios(
+    tensor: SummaryTensor,
+    combos: List[str],
+    cutoff: float,
+    order: np.ndarray,
+    counts: np.ndarray
+) -> np.ndarray:
+    """calculate_competition_ratio cho mọi bán kính cùng lúc."""
+    c_idx = tensor.combo_indices(combos)
+    if not c_idx:
+        return np.full(len(counts), np.nan)
+
+    students = tensor.students[c_idx].sum(axis=0)  # [tỉnh, mốc]
+    rows = tensor.rows[c_idx].sum(axis=(0, 2))     # [tỉnh]
+
+    zeros = np.zeros(students.shape[0])
+    t_cut = tensor.threshold_index(cutoff)
+    t_base = tensor.threshold_index(BASE_SCORE)
+    above_cutoff = _cumulative_at(students[:, t_cut] if t_cut >= 0 else zeros, order, counts)
+    above_base = _cumulative_at(students[:, t_base] if t_base >= 0 else zeros, order, counts)
+    has_rows = _cumulative_at(rows, order, counts) > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = above_cutoff / above_base
+    return np.where(has_rows & (above_base != 0), ratios, np.nan)
+
+
+def sweep_lookup_scores(
+    tensor: SummaryTensor,
+    combos: List[str],
+    target_ratios: np.ndarray,
+    order: np.ndarray,
+    counts: np.ndarray
+) -> np.ndarray:
+    """lookup_score_from_ratio cho mọi bán kính cùng lúc (mỗi bán kính 1 target_ratio)."""
+    result = np.full(len(counts), np.nan)
+    c_idx = tensor.combo_indices(combos)
+    if not c_idx:
+        return result
+
+    students = _cumulative_at(tensor.students[c_idx].sum(axis=0), order, counts)  # [bán kính, mốc]
+    rows = _cumulative_at(tensor.rows[c_idx].sum(axis=0), order, counts)
+    t_base = tensor.threshold_index(BASE_SCORE)
+
+    for i, target_ratio in enumerate(target_ratios):
+        if pd.isna(target_ratio):
+            continue
+        above_base = students[i, t_base] if t_base >= 0 else 0
+        if above_base == 0:
+            continue
+        present = rows[i] > 0
+        if not present.any():
+            continue
+        diffs = np.abs(students[i][present] - target_ratio * above_base)
+        result[i] = tensor.thresholds[present][np.argmin(diffs)]
+    return result
+
+
+# =============================================================================
+# 3. FEATURES CHO MỌI BÁN KÍNH
+# =============================================================================
+
+def build_features_for_radii(
+    pretrain: pd.DataFrame,
+    schools: pd.DataFrame,
+    provinces: pd.DataFrame,
+    summaries: Dict[int, pd.DataFrame],
+    target_year: int,
+    radii: List[float] = DEFAULT_RADII
+) -> Dict[float, pd.DataFrame]:
+    """
+    Kết quả giống build_training_features(..., radius_km=r) cho từng r trong radii,
+    nhưng mỗi ngành chỉ duyệt 1 lần.
+    """
+    province_order = ProvinceOrder(schools, provinces, radii)
+    tensors = {
+        year: SummaryTensor(summaries[year], province_order.province_codes)
+        for year in range(target_year - 4, target_year + 1) if year in summaries
+    }
+    n_radii = len(radii)
+    records = {r: [] for r in radii}
+
+    for _, row in pretrain.iterrows():
+        order, counts = province_order.get(row['school_code'])
+
+        try:
+            scores, ratios, combos_list = [], [], []
+            for offset in [1, 2, 3, 4]:
+                year = target_year - offset
+                score = row.get(f'score_{year}', np.nan)
+                combo = parse_subject_combos(row.get(f'combo_{year}', ''))
+                scores.append(score)
+                combos_list.append(combo)
+
+                if not pd.isna(score) and combo and year in tensors:
+                    ratios.append(sweep_ratios(tensors[year], combo, floor_to_step(score), order, counts))
+                else:
+                    ratios.append(np.full(n_radii, np.nan))
+            score_target = row[f'score_{target_year}']
+        except KeyError:
+            continue
+
+        if pd.isna(scores[0]):
+            continue
+
+        weighted = np.array([compute_weighted_ratio([r[i] for r in ratios]) for i in range(n_radii)])
+        target_combos = get_target_combos(row, target_year, combos_list[0])
+        if target_year in tensors:
+            lookup = sweep_lookup_scores(tensors[target_year], target_combos, weighted, order, counts)
+        else:
+            lookup = np.full(n_radii, np.nan)
+
+        for i, radius in enumerate(radii):
+            records[radius].append(make_feature_record(
+                row['school_code'], row['major_code'], row['major_name'], target_year,
+                scores, [r[i] for r in ratios], weighted[i], lookup[i], score_target
+            ))
+
+    return {radius: finalize_features(recs) for radius, recs in records.items()}
+
+
+# =============================================================================
+# 4. ĐÁNH GIÁ THEO BÁN KÍNH
+# =============================================================================
+
+def _fit_predict(model_name: str, params: Dict, df_train: pd.DataFrame, df_eval: pd.DataFrame) -> np.ndarray:
+    X_train = df_train[FEATURE_COLS].values
+    X_eval = df_eval[FEATURE_COLS].values
+    model = build_model(model_name, params)
+    if 'Regression' in model_name:
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X_train)
+        X_eval = scaler.transform(X_eval)
+    model.fit(X_train, df_train['score_target'].values)
+    return model.predict(X_eval)
+
+
+def _metrics(prefix: str, y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    return {
+        f'{prefix}_MAE': mean_absolute_error(y_true, y_pred),
+        f'{prefix}_RMSE': np.sqrt(mean_squared_error(y_true, y_pred)),
+        f'{prefix}_R2': r2_score(y_true, y_pred),
+    }
+
+
+def run_radius_sweep(
+    radii: List[float] = DEFAULT_RADII,
+    model_name: str = 'Random Forest',
+    params: Dict = None,
+    output_path: str = None
+) -> pd.DataFrame:
+    """
+    Với mỗi bán kính: train/valid 80/20 trên target 2023 (như main), sau đó
+    train trên toàn bộ 2023 và test trên 2024.
+    """
+    print("Loading data...")
+    schools, provinces, pretrain, summaries = load_data()
+
+    print(f"Building features for {len(radii)} radii: {list(radii)}")
+    features_2023 = build_features_for_radii(pretrain, schools, provinces, summaries, 2023, radii)
+    features_2024 = build_features_for_radii(pretrain, schools, provinces, summaries, 2024, radii)
+
+    rows = []
+    for radius in radii:
+        df_2023, df_2024 = features_2023[radius], features_2024[radius]
+        df_train, df_valid = train_test_split(df_2023, test_size=0.2, random_state=42)
+
+        row = {'radius_km': radius, 'n_train': len(df_2023), 'n_test': len(df_2024)}
+        row.update(_metrics('valid', df_valid['score_target'].values,
+                            _fit_predict(model_name, params, df_train, df_valid)))
+        row.update(_metrics('test', df_2024['score_target'].values,
+                            _fit_predict(model_name, params, df_2023, df_2024)))
+        rows.append(row)
+        print(f"  radius={radius:>6g} km | valid R² = {row['valid_R2']:.4f} | test R² = {row['test_R2']:.4f}")
+
+    result = pd.DataFrame(rows)
+    if output_path is None:
+        output_path = os.path.join(DATA_DIR, 'radius_sweep.csv')
+    result.to_csv(output_path, index=False, encoding='utf-8-sig')
+    print(f"\nSweep saved to: {output_path}")
+    return result
+
+
+if __name__ == '__main__':
+    result = run_radius_sweep()
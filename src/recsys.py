@@ -6,46 +6,103 @@ Usage:
     
     data = load_data()
     recommendations = recommend(sbd="1000001", data=data, selected_majors=None)
+    
+    # Build 1 lần, phục vụ nhiều request / lưu xuống đĩa để khởi động nhanh
+    engine = RecommendationEngine(data)
+    engine.save('models/recsys_engine.pkl')
+    engine = RecommendationEngine.load('models/recsys_engine.pkl')
+
+Snapshot nhị phân cho khởi động nhanh (load_data tự dùng khi hash nguồn khớp):
+    python src/recsys.py snapshot
 """
 
 import os
+import sys
 import json
+import pickle
+import hashlib
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import pandas as pd
 import numpy as np
 from typing import List, Tuple, Optional
 from math import radians, sin, cos, sqrt, atan2
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
+
+try:
+    from major_index import build_index
+except ImportError:
+    from src.major_index import build_index
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_DIR = os.path.join(BASE_DIR, 'data')
 
+# File nguồn của load_data (key = tên trong dict data)
+SOURCE_FILES = {
+    'diem_thi_2024': 'diem_thi_2024_new.csv',
+    'predictions_2024': 'predictions_2024.csv',
+    'diem_chuan_2023': 'diem_chuan_chuan_hoa.csv',
+    'schools': 'school_with_coords.csv',
+    'school_names': 'school.csv',
+    'provinces': 'province.csv',
+    'to_hop': 'to_hop.json',
+}
+SNAPSHOT_FORMAT_VERSION = 1
+
+# Các môn dùng để tính điểm tổ hợp
+CANDIDATE_SUBJECTS = ['Toán', 'Văn', 'Ngoại ngữ', 'Lí', 'Hóa', 'Sinh', 'Sử', 'Địa', 'GDCD']
+
+# Cột kết quả recommend_batch (SBD, hạng + các cột của recommend)
+BATCH_COLUMNS = [
+    'SBD', 'Hạng', 'Mã trường', 'Tên trường', 'Mã ngành', 'Tên ngành',
+    'Điểm 2023', 'Dự đoán', 'Điểm TS', 'Km', 'Score'
+]
+
 
-def load_data() -> dict:
-    """Load tất cả dữ liệu cần thiết."""
-    diem_thi_2024 = pd.read_csv(os.path.join(DATA_DIR, 'diem_thi_2024_new.csv'), encoding='utf-8-sig')
+def load_data(use_snapshot: bool = True, snapshot_dir: Optional[str] = None) -> dict:
+    """
+    Load tất cả dữ liệu cần thiết.
+    
+    Nếu có snapshot (write_snapshot) và hash các file nguồn khớp manifest thì load
+    từ snapshot (.npy memory-map), không parse lại CSV.
+    """
+    if use_snapshot:
+        data = load_snapshot(snapshot_dir)
+        if data is not None:
+            return data
+    return _load_csv_data()
+
+
+def _load_csv_data() -> dict:
+    """Parse CSV/JSON nguồn và chuẩn bị dữ liệu cho engine."""
+    diem_thi_2024 = pd.read_csv(os.path.join(DATA_DIR, SOURCE_FILES['diem_thi_2024']), encoding='utf-8-sig')
     diem_thi_2024['SBD'] = diem_thi_2024['SBD'].astype(str)
     diem_thi_2024['MA_TINH'] = diem_thi_2024['MA_TINH'].astype(str).str.zfill(2)
     
-    predictions_2024 = pd.read_csv(os.path.join(DATA_DIR, 'predictions_2024.csv'), encoding='utf-8-sig')
+    predictions_2024 = pd.read_csv(os.path.join(DATA_DIR, SOURCE_FILES['predictions_2024']), encoding='utf-8-sig')
     predictions_2024['major_code'] = predictions_2024['major_code'].astype(str)
     
-    diem_chuan = pd.read_csv(os.path.join(DATA_DIR, 'diem_chuan_chuan_hoa.csv'), encoding='utf-8-sig')
+    diem_chuan = pd.read_csv(os.path.join(DATA_DIR, SOURCE_FILES['diem_chuan_2023']), encoding='utf-8-sig')
     diem_chuan_2023 = diem_chuan[diem_chuan['Năm xét tuyển'] == 2023].copy()
     diem_chuan_2023 = diem_chuan_2023[~diem_chuan_2023['Mã ngành'].astype(str).str.contains(r'\*', regex=True)]
     diem_chuan_2023['Mã ngành'] = diem_chuan_2023['Mã ngành'].astype(str)
     
-    schools = pd.read_csv(os.path.join(DATA_DIR, 'school_with_coords.csv'), encoding='utf-8-sig')
+    schools = pd.read_csv(os.path.join(DATA_DIR, SOURCE_FILES['schools']), encoding='utf-8-sig')
     schools.columns = ['school_code', 'school_name', 'lat', 'lon']
     
-    school_names = pd.read_csv(os.path.join(DATA_DIR, 'school.csv'), encoding='utf-8-sig')
+    school_names = pd.read_csv(os.path.join(DATA_DIR, SOURCE_FILES['school_names']), encoding='utf-8-sig')
     school_names.columns = ['school_code', 'school_name', 'link']
     
-    provinces = pd.read_csv(os.path.join(DATA_DIR, 'province.csv'), encoding='utf-8-sig')
+    provinces = pd.read_csv(os.path.join(DATA_DIR, SOURCE_FILES['provinces']), encoding='utf-8-sig')
     provinces['MA_TINH'] = provinces['MA_TINH'].astype(str).str.zfill(2)
     
-    with open(os.path.join(DATA_DIR, 'to_hop.json'), 'r', encoding='utf-8') as f:
+    with open(os.path.join(DATA_DIR, SOURCE_FILES['to_hop']), 'r', encoding='utf-8') as f:
         to_hop = json.load(f)
     
     return {
@@ -59,6 +116,130 @@ def load_data() -> dict:
     }
 
 
+# =============================================================================
+# SNAPSHOT
+# =============================================================================
+
+def _snapshot_dir(snapshot_dir: Optional[str] = None) -> str:
+    return snapshot_dir or os.path.join(DATA_DIR, 'snapshot', 'recsys')
+
+
+def _file_sha256(path: str) -> str:
+    """SHA-256 của 1 file (đọc theo chunk)."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _source_hashes() -> dict:
+    return {f: _file_sha256(os.path.join(DATA_DIR, f)) for f in SOURCE_FILES.values()}
+
+
+def _save_array(out_dir: str, name: str, values: np.ndarray) -> str:
+    fname = f"{name}.npy"
+    np.save(os.path.join(out_dir, fname), values, allow_pickle=False)
+    return fname
+
+
+def _save_column(out_dir: str, name: str, s: pd.Series) -> dict:
+    """Lưu 1 cột: số -> .npy; chuỗi -> .npy unicode + mask NaN; kiểu khác -> pickle."""
+    if s.dtype != object:
+        return {'kind': 'array', 'file': _save_array(out_dir, name, s.to_numpy())}
+    na = s.isna().to_numpy()
+    if s[~na].map(type).eq(str).all():
+        values = np.array(s.where(~na, '').tolist(), dtype=str)
+        col = {'kind': 'str', 'file': _save_array(out_dir, name, values)}
+        if na.any():
+            col['na_file'] = _save_array(out_dir, f"{name}__na", na)
+        return col
+    fname = f"{name}.pkl"
+    s.to_pickle(os.path.join(out_dir, fname))
+    return {'kind': 'pickle', 'file': fname}
+
+
+def _load_column(in_dir: str, col: dict) -> np.ndarray:
+    if col['kind'] == 'pickle':
+        return pd.read_pickle(os.path.join(in_dir, col['file'])).to_numpy()
+    values = np.load(os.path.join(in_dir, col['file']), mmap_mode='r')
+    if col['kind'] == 'array':
+        return values
+    values = values.astype(object)
+    if 'na_file' in col:
+        values[np.load(os.path.join(in_dir, col['na_file']))] = np.nan
+    return values
+
+
+def write_snapshot(data: Optional[dict] = None, snapshot_dir: Optional[str] = None) -> str:
+    """
+    Ghi dữ liệu đã chuẩn bị (đã lọc, đúng kiểu) của load_data thành thư mục .npy
+    (memory-map được) + manifest.json kèm SHA-256 của các file nguồn.
+    
+    Returns:
+        Đường dẫn manifest.json
+    """
+    out_dir = _snapshot_dir(snapshot_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    hashes = _source_hashes()
+    if data is None:
+        data = _load_csv_data()
+    
+    frames = {}
+    for name, df in data.items():
+        if name == 'to_hop':
+            continue
+        index = df.index
+        entry = {'n_rows': len(df), 'columns': []}
+        if isinstance(index, pd.RangeIndex):
+            entry['index'] = {'range': [index.start, index.stop, index.step]}
+        else:
+            entry['index'] = {'file': _save_array(out_dir, f"{name}__index", index.to_numpy())}
+        for i, col in enumerate(df.columns):
+            entry['columns'].append({'name': col, **_save_column(out_dir, f"{name}__{i}", df[col])})
+        frames[name] = entry
+    
+    manifest = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'created': pd.Timestamp.now().isoformat(timespec='seconds'),
+        'sources': hashes,
+        'frames': frames,
+        'to_hop': data['to_hop'],
+    }
+    path = os.path.join(out_dir, 'manifest.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return path
+
+
+def load_snapshot(snapshot_dir: Optional[str] = None) -> Optional[dict]:
+    """Load snapshot nếu tồn tại và hash các file nguồn khớp; ngược lại None."""
+    in_dir = _snapshot_dir(snapshot_dir)
+    path = os.path.join(in_dir, 'manifest.json')
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        return None
+    try:
+        if manifest['sources'] != _source_hashes():
+            return None
+    except FileNotFoundError:
+        return None
+    
+    data = {}
+    for name, entry in manifest['frames'].items():
+        if 'range' in entry['index']:
+            index = pd.RangeIndex(*entry['index']['range'])
+        else:
+            index = pd.Index(np.load(os.path.join(in_dir, entry['index']['file'])))
+        columns = {c['name']: _load_column(in_dir, c) for c in entry['columns']}
+        data[name] = pd.DataFrame(columns, index=index, columns=[c['name'] for c in entry['columns']])
+    data['to_hop'] = manifest['to_hop']
+    return data
+
+
 def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Tính khoảng cách (km) giữa 2 điểm."""
     R = 6371
@@ -67,6 +248,14 @@ def _haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * 2 * atan2(sqrt(a), sqrt(1 - a))
 
 
+def _haversine_np(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Haversine (km) cho mảng NumPy, broadcast theo shape của các tham số."""
+    R = 6371
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
 def _get_coords(code: str, df: pd.DataFrame, code_col: str = 'school_code') -> Optional[Tuple[float, float]]:
     """Lấy tọa độ từ DataFrame."""
     r = df[df[code_col] == code]
@@ -82,15 +271,14 @@ def _get_candidate_info(sbd: str, data: dict) -> Optional[dict]:
     c = data['diem_thi_2024'][data['diem_thi_2024']['SBD'] == str(sbd)]
     if len(c) == 0:
         return None
-    r = c.iloc[0]
-    return {
-        'SBD': r['SBD'], 'MA_TINH': r['MA_TINH'],
-        'Toán': r.get('Toán', np.nan), 'Văn': r.get('Văn', np.nan),
-        'Ngoại ngữ': r.get('Ngoại ngữ', np.nan), 'Lí': r.get('Lí', np.nan),
-        'Hóa': r.get('Hóa', np.nan), 'Sinh': r.get('Sinh', np.nan),
-        'Sử': r.get('Sử', np.nan), 'Địa': r.get('Địa', np.nan),
-        'GDCD': r.get('GDCD', np.nan)
-    }
+    return _candidate_info_from_row(c.iloc[0])
+
+
+def _candidate_info_from_row(r: pd.Series) -> dict:
+    """Dict thông tin thí sinh từ 1 dòng diem_thi_2024."""
+    info = {'SBD': r['SBD'], 'MA_TINH': r['MA_TINH']}
+    info.update({s: r.get(s, np.nan) for s in CANDIDATE_SUBJECTS})
+    return info
 
 
 def _calc_block_scores(info: dict, to_hop: dict) -> dict:
@@ -103,71 +291,359 @@ def _calc_block_scores(info: dict, to_hop: dict) -> dict:
     return bs
 
 
+class LRUCache:
+    """Cache LRU có giới hạn số phần tử + TTL (giây), đếm hit/miss. maxsize=0 -> tắt."""
+    
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = 600.0):
+        self.maxsize, self.ttl = maxsize, ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+    
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and (self.ttl is None or time.monotonic() - item[0] <= self.ttl):
+                self._items.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._items[key]
+            self.misses += 1
+            return None
+    
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic(), value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.hits = self.misses = 0
+    
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._items), 'hits': self.hits, 'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0
+        }
+    
+    def __getstate__(self):
+        # Không lưu nội dung cache/lock khi pickle engine
+        return {'maxsize': self.maxsize, 'ttl': self.ttl}
+    
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+
 class RecommendationEngine:
-    """Hệ thống gợi ý ngành học."""
+    """
+    Hệ thống gợi ý ngành học.
+    
+    Vòng đời: build() 1 lần (TF-IDF, catalog ngành, tọa độ, tên trường, index SBD)
+    rồi gọi recommend() nhiều lần. save()/load() để khởi động nhanh từ đĩa.
+    """
     
-    def __init__(self, data: dict):
+    def __init__(
+        self,
+        data: dict,
+        build: bool = True,
+        interest_index: str = 'brute',
+        interest_top_m: Optional[int] = None,
+        index_params: Optional[dict] = None,
+        cache_size: int = 4096,
+        cache_ttl: Optional[float] = 600.0
+    ):
+        """
+        Args:
+            data: Dict từ load_data()
+            build: Gọi build() ngay
+            interest_index: Index tên ngành cho interest ('brute' | 'lsh', xem major_index)
+            interest_top_m: Nếu có, chỉ M tên ngành gần nhất (theo index) có interest > 0
+            index_params: kwargs cho index (vd n_planes, n_tables của LSH)
+            cache_size, cache_ttl: Giới hạn + TTL (giây) của các cache recommend (0 = tắt)
+        """
         self.data = data
+        self.interest_index = interest_index
+        self.interest_top_m = interest_top_m
+        self.index_params = index_params or {}
+        # Kết quả cuối; phần theo thí sinh (điểm tổ hợp, tọa độ nhà); tập ngành qua lọc + geo/interest
+        self.result_cache = LRUCache(cache_size, cache_ttl)
+        self.candidate_cache = LRUCache(cache_size, cache_ttl)
+        self.feasible_cache = LRUCache(cache_size, cache_ttl)
+        self.is_built = False
+        if build:
+            self.build()
+    
+    def build(self) -> 'RecommendationEngine':
+        """Tiền tính mọi thứ không phụ thuộc thí sinh."""
         self._build_tfidf()
+        self._build_catalog()
+        self._build_combo_index()
+        self._build_lookups()
+        for cache in (self.result_cache, self.candidate_cache, self.feasible_cache):
+            cache.clear()
+        self.is_built = True
+        return self
+    
+    def cache_stats(self) -> dict:
+        """Hit/miss/hit rate của từng cache."""
+        return {
+            'result': self.result_cache.stats(),
+            'candidate': self.candidate_cache.stats(),
+            'feasible': self.feasible_cache.stats(),
+        }
+    
+    def save(self, path: str):
+        """Lưu engine đã build (kèm data) xuống đĩa."""
+        if not self.is_built:
+            self.build()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    @classmethod
+    def load(cls, path: str) -> 'RecommendationEngine':
+        """Load engine đã lưu bằng save()."""
+        with open(path, 'rb') as f:
+            engine = pickle.load(f)
+        if not isinstance(engine, cls):
+            raise TypeError(f"{path} không chứa RecommendationEngine.")
+        return engine
     
     def _build_tfidf(self):
         """Build TF-IDF matrix cho tên ngành."""
         self.major_names = self.data['predictions_2024']['major_name'].unique().tolist()
         self.tfidf = TfidfVectorizer(ngram_range=(1, 2), lowercase=True)
         self.tfidf_matrix = self.tfidf.fit_transform(self.major_names)
+        self.tfidf_unit = normalize(self.tfidf_matrix).tocsr()
+        self.name_index = build_index(self.tfidf_unit, self.interest_index, **self.index_params)
         self.name_to_idx = {n: i for i, n in enumerate(self.major_names)}
+        self._oov_vectors = {}
+    
+    def _build_catalog(self):
+        """
+        Gộp dự đoán 2024 với điểm chuẩn 2023 (1 lần) và tạo mảng theo từng ngành:
+        predicted, score_2023, bitmask tổ hợp (bit i = tổ hợp thứ i trong to_hop),
+        tọa độ + tên trường.
+        """
+        preds = self.data['predictions_2024'].copy()
+        d23 = self.data['diem_chuan_2023'][['Mã trường', 'Mã ngành', 'Điểm chuẩn', 'Tổ hợp môn']].copy()
+        d23.columns = ['school_code', 'major_code', 'score_2023', 'to_hop_mon']
+        d23['major_code'] = d23['major_code'].astype(str)
+        self.catalog = preds.merge(d23, on=['school_code', 'major_code'], how='left')
+        
+        self.block_codes = list(self.data['to_hop'].keys())
+        if len(self.block_codes) > 64:
+            raise ValueError(f"to_hop có {len(self.block_codes)} tổ hợp, bitmask uint64 chỉ chứa được 64.")
+        self.block_bits = {b: np.uint64(1) << np.uint64(i) for i, b in enumerate(self.block_codes)}
+        
+        combo_mask = np.zeros(len(self.catalog), dtype=np.uint64)
+        for i, thm in enumerate(self.catalog['to_hop_mon']):
+            if pd.isna(thm):
+                continue
+            for b in str(thm).split(';'):
+                bit = self.block_bits.get(b.strip())
+                if bit is not None:
+                    combo_mask[i] |= bit
+        self.combo_mask = combo_mask
+        self.catalog_name_idx = self.catalog['major_name'].map(self.name_to_idx).to_numpy()
+        self.block_rows = [np.flatnonzero(combo_mask & bit) for bit in self.block_bits.values()]
+        
+        self.pred = self.catalog['predicted'].to_numpy(dtype=float)
+        self.score_2023 = self.catalog['score_2023'].to_numpy(dtype=float)
+        self.valid = ~(
+            np.isnan(self.pred) | np.isnan(self.score_2023) | self.catalog['to_hop_mon'].isna().to_numpy()
+        )
+        
+        # (mã trường, mã ngành) -> các dòng catalog, dùng để loại ngành đã chọn
+        self.major_rows = {}
+        for i, key in enumerate(zip(self.catalog['school_code'], self.catalog['major_code'])):
+            self.major_rows.setdefault(key, []).append(i)
+        
+        # Tọa độ + tên trường theo từng dòng catalog (lấy dòng đầu tiên như _get_coords)
+        schools = self.data['schools'].drop_duplicates('school_code')
+        coords = self.catalog[['school_code']].merge(schools, on='school_code', how='left')
+        self.school_lat = coords['lat'].to_numpy(dtype=float)
+        self.school_lon = coords['lon'].to_numpy(dtype=float)
+        self.has_school_coords = self.catalog['school_code'].isin(schools['school_code']).to_numpy()
+        
+        names = self.data['school_names'].drop_duplicates('school_code').set_index('school_code')['school_name']
+        self.school_name = self.catalog['school_code'].map(names).fillna(self.catalog['school_code']).to_numpy()
+        
+        # Chỉ số trường (unique) của từng dòng catalog
+        self.school_idx, _ = pd.factorize(self.catalog['school_code'], use_na_sentinel=False)
+        self.school_first_row = pd.Series(np.arange(len(self.catalog))).groupby(self.school_idx).first().to_numpy()
+    
+    def _build_combo_index(self):
+        """
+        Inverted list theo tổ hợp: các dòng catalog hợp lệ nhận tổ hợp đó,
+        sắp theo điểm dự đoán để tìm cửa sổ ±tolerance bằng binary search.
+        """
+        self.combo_rows, self.combo_pred = [], []
+        for rows in self.block_rows:
+            rows = rows[self.valid[rows]]
+            rows = rows[np.argsort(self.pred[rows], kind='stable')]
+            self.combo_rows.append(rows)
+            self.combo_pred.append(self.pred[rows])
+        self.block_pos = {b: i for i, b in enumerate(self.block_codes)}
+    
+    def _window_rows(self, block_scores: dict, score_tolerance: float) -> np.ndarray:
+        """
+        Các dòng catalog có predicted trong [điểm - tol, điểm + tol] của ít nhất 1 tổ hợp
+        của thí sinh (tập cha của các ngành qua lọc), sắp theo thứ tự catalog.
+        """
+        eps = 1e-9  # nới cửa sổ, điều kiện chính xác được kiểm tra lại sau
+        found = []
+        for b, score in block_scores.items():
+            k = self.block_pos[b]
+            lo = np.searchsorted(self.combo_pred[k], score - score_tolerance - eps, side='left')
+            hi = np.searchsorted(self.combo_pred[k], score + score_tolerance + eps, side='right')
+            found.append(self.combo_rows[k][lo:hi])
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+    
+    def _build_lookups(self):
+        """Index SBD, tọa độ tỉnh và tọa độ trường (dòng đầu tiên như _get_coords)."""
+        sbd = self.data['diem_thi_2024']['SBD']
+        first = ~sbd.duplicated()
+        self.sbd_pos = pd.Series(np.flatnonzero(first.to_numpy()), index=sbd[first].to_numpy())
+        
+        provinces = self.data['provinces'].drop_duplicates('MA_TINH')
+        self.province_coords = {
+            code: (lat, lon) for code, lat, lon
+            in zip(provinces['MA_TINH'], provinces['VI_DO'], provinces['KINH_DO'])
+        }
+        schools = self.data['schools'].drop_duplicates('school_code')
+        self.school_coord_map = {
+            code: (lat, lon) for code, lat, lon
+            in zip(schools['school_code'], schools['lat'], schools['lon'])
+        }
+        self._home_geo_cache = {}
+    
+    def _home_geo(self, ma_tinh: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Geo score khi chưa chọn NV và Km (đã làm tròn, 9999 nếu thiếu tọa độ)
+        từ tỉnh tới trường của mọi dòng catalog. Cache theo tỉnh.
+        """
+        if ma_tinh not in self._home_geo_cache:
+            rows = self.school_first_row
+            geo_u, dist_u = self._geo_scores(rows, self.province_coords.get(ma_tinh), [])
+            self._home_geo_cache[ma_tinh] = (geo_u[self.school_idx], np.round(dist_u, 0)[self.school_idx])
+        return self._home_geo_cache[ma_tinh]
+    
+    def _candidate_info(self, sbd: str) -> Optional[dict]:
+        """Tra cứu thí sinh qua index SBD."""
+        pos = self.sbd_pos.get(str(sbd))
+        if pos is None:
+            return None
+        return _candidate_info_from_row(self.data['diem_thi_2024'].iloc[pos])
+    
+    def _candidate_scores(self, block_scores: dict, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Điểm thí sinh cho từng ngành (các dòng `rows`, mặc định cả catalog)
+        = max điểm các tổ hợp ngành nhận mà thí sinh có. NaN nếu không khớp tổ hợp nào.
+        """
+        combo_mask = self.combo_mask if rows is None else self.combo_mask[rows]
+        cand = np.full(len(combo_mask), np.nan)
+        remaining = np.ones(len(combo_mask), dtype=bool)
+        # Duyệt tổ hợp theo điểm giảm dần: tổ hợp khớp đầu tiên của mỗi ngành là max
+        for b in sorted(block_scores, key=block_scores.get, reverse=True):
+            hit = remaining & ((combo_mask & self.block_bits[b]) != 0)
+            cand[hit] = block_scores[b]
+            remaining &= ~hit
+        return cand
+    
+    def _interest_profile(self, selected_names: List[str]) -> Optional[np.ndarray]:
+        """Vector TF-IDF trung bình (đã chuẩn hóa L2) của các ngành đã chọn."""
+        idxs = [self.name_to_idx[n] for n in selected_names if n in self.name_to_idx]
+        if not idxs:
+            return None
+        avg = np.asarray(self.tfidf_matrix[idxs].mean(axis=0)).ravel()
+        norm = np.linalg.norm(avg)
+        return avg / norm if norm > 0 else avg
+    
+    def _name_vector(self, name: str):
+        """Vector TF-IDF (chuẩn hóa L2, sparse) của 1 tên ngành; tên ngoài catalog được cache."""
+        if name in self.name_to_idx:
+            return self.tfidf_unit[self.name_to_idx[name]]
+        if name not in self._oov_vectors:
+            self._oov_vectors[name] = normalize(self.tfidf.transform([name])).tocsr()
+        return self._oov_vectors[name]
+    
+    def _interest_scores(self, selected_names: List[str]) -> np.ndarray:
+        """
+        Similarity giữa ngành đã chọn và mọi dòng catalog (1 phép nhân sparse mat-vec).
+        Với interest_top_m: chỉ M tên ngành gần nhất theo index, còn lại = 0.
+        """
+        profile = self._interest_profile(selected_names)
+        if profile is None:
+            return np.zeros(len(self.catalog))
+        if self.interest_top_m is None:
+            sims = np.maximum(self.name_index.similarities(profile), 0.0)
+        else:
+            ids, top = self.name_index.top_m(profile, self.interest_top_m)
+            sims = np.zeros(len(self.major_names))
+            sims[ids] = np.maximum(top, 0.0)
+        return sims[self.catalog_name_idx]
     
     def _interest_sim(self, selected_names: List[str], candidate_name: str) -> float:
         """Tính similarity giữa ngành đã chọn và candidate."""
-        if not selected_names:
+        profile = self._interest_profile(selected_names)
+        if profile is None:
             return 0.0
-        vecs = [self.tfidf_matrix[self.name_to_idx[n]].toarray().flatten()
-                for n in selected_names if n in self.name_to_idx]
-        if not vecs:
-            return 0.0
-        avg = np.mean(vecs, axis=0).reshape(1, -1)
-        if candidate_name in self.name_to_idx:
-            cand = self.tfidf_matrix[self.name_to_idx[candidate_name]].toarray()
-        else:
-            cand = self.tfidf.transform([candidate_name]).toarray()
-        return max(0.0, cosine_similarity(avg, cand)[0][0])
+        return max(0.0, float((self._name_vector(candidate_name) @ profile)[0]))
     
-    def _calc_geo_score(
+    def _geo_scores(
         self,
-        school_code: str,
-        home_coords: tuple,
+        rows: np.ndarray,
+        home_coords: Optional[tuple],
         selected_school_coords: List[tuple]
-    ) -> float:
+    ) -> Tuple[np.ndarray, np.ndarray]:
         """
-        Tính geo score (0-1).
+        Tính geo score (0-1) cho các dòng catalog `rows`.
         
         - Chưa chọn NV: 100% gần nhà
         - Đã chọn NV: 20% nhà + 80% chia cho NV theo priority
-        """
-        school_coords = _get_coords(school_code, self.data['schools'])
-        if not school_coords:
-            return 0.0
         
-        def dist_score(from_coords, to_coords):
-            if not from_coords or not to_coords:
-                return 0.0
-            d = _haversine(*from_coords, *to_coords)
-            return 1 / (1 + d / 100)
+        Khoảng cách nhà + từng NV tính bằng 1 lần haversine broadcast (1 + n_NV) × len(rows).
         
-        home_score = dist_score(home_coords, school_coords)
+        Returns:
+            (geo, dist_home): dist_home = 9999 nếu thiếu tọa độ nhà hoặc trường
+        """
+        lat, lon = self.school_lat[rows], self.school_lon[rows]
+        has_school = self.has_school_coords[rows]
         
-        if not selected_school_coords:
-            return home_score
+        origins = ([home_coords] if home_coords else []) + list(selected_school_coords)
+        if origins:
+            o = np.array(origins, dtype=float)
+            dist = _haversine_np(o[:, :1], o[:, 1:], lat[None, :], lon[None, :])
+            scores = 1 / (1 + dist / 100)
         
-        n = len(selected_school_coords)
-        weights = [n - i for i in range(n)]
-        total_w = sum(weights)
-        weights = [w / total_w for w in weights]
+        if home_coords:
+            dist_home, home_score = dist[0], scores[0]
+            nv_scores = scores[1:]
+        else:
+            dist_home, home_score = np.full(len(rows), np.nan), np.zeros(len(rows))
+            nv_scores = scores if origins else np.empty((0, len(rows)))
         
-        nv_scores = [dist_score(selected_school_coords[i], school_coords) for i in range(n)]
-        weighted_nv_score = sum(w * s for w, s in zip(weights, nv_scores))
+        if selected_school_coords:
+            n = len(selected_school_coords)
+            weights = np.arange(n, 0, -1, dtype=float)
+            weights = weights / weights.sum()
+            geo = 0.2 * home_score + 0.8 * (weights[:, None] * nv_scores).sum(axis=0)
+        else:
+            geo = home_score
         
-        return 0.2 * home_score + 0.8 * weighted_nv_score
+        geo = np.where(has_school, geo, 0.0)
+        dist_home = np.where(has_school & (home_coords is not None), dist_home, 9999.0)
+        return geo, dist_home
     
     def recommend(
         self,
@@ -194,90 +670,311 @@ class RecommendationEngine:
         Returns:
             DataFrame với top K gợi ý
         """
-        info = _get_candidate_info(sbd, self.data)
-        if not info:
+        if not self.is_built:
+            self.build()
+        
+        parts = self._candidate_parts(str(sbd))
+        if parts is None:
             raise ValueError(f"Không tìm thấy thí sinh: {sbd}")
         
         if verbose:
-            print(f"Thí sinh: {sbd} | Tỉnh: {info['MA_TINH']}")
+            print(f"Thí sinh: {sbd} | Tỉnh: {parts['MA_TINH']}")
         
-        block_scores = _calc_block_scores(info, self.data['to_hop'])
-        if not block_scores:
+        if not parts['block_scores']:
             raise ValueError("Không đủ điểm để tính bất kỳ khối nào.")
         
-        prov = self.data['provinces'][self.data['provinces']['MA_TINH'] == info['MA_TINH']]
-        home_coords = (prov.iloc[0]['VI_DO'], prov.iloc[0]['KINH_DO']) if len(prov) > 0 else None
-        
-        selected_names, selected_school_coords, excluded = [], [], set()
-        if selected_majors:
-            for sc, mc in selected_majors:
-                excluded.add((sc, str(mc)))
-                sc_coords = _get_coords(sc, self.data['schools'])
-                if sc_coords:
-                    selected_school_coords.append(sc_coords)
-                match = self.data['predictions_2024'][
-                    (self.data['predictions_2024']['school_code'] == sc) &
-                    (self.data['predictions_2024']['major_code'] == str(mc))
-                ]
-                if len(match) > 0:
-                    selected_names.append(match.iloc[0]['major_name'])
-        
+        selected = tuple((sc, str(mc)) for sc, mc in (selected_majors or []))
         if verbose:
-            print(f"Đã chọn: {len(excluded)} ngành | Loại trừ khỏi gợi ý")
+            print(f"Đã chọn: {len(set(selected))} ngành | Loại trừ khỏi gợi ý")
         
-        preds = self.data['predictions_2024'].copy()
-        d23 = self.data['diem_chuan_2023'][['Mã trường', 'Mã ngành', 'Điểm chuẩn', 'Tổ hợp môn']].copy()
-        d23.columns = ['school_code', 'major_code', 'score_2023', 'to_hop_mon']
-        d23['major_code'] = d23['major_code'].astype(str)
-        preds = preds.merge(d23, on=['school_code', 'major_code'], how='left')
+        result_key = (str(sbd), selected, score_tolerance, top_k, w_score, w_geo, w_interest)
+        cached = self.result_cache.get(result_key)
+        if cached is not None:
+            if verbose and len(cached) == 0:
+                print("Không tìm thấy ngành phù hợp.")
+            return cached.copy()
         
-        results = []
-        for _, row in preds.iterrows():
-            sc, mc = row['school_code'], row['major_code']
-            if (sc, mc) in excluded:
-                continue
-            
-            pred, s23, thm = row['predicted'], row.get('score_2023'), row.get('to_hop_mon', '')
-            if pd.isna(pred) or pd.isna(s23) or pd.isna(thm):
-                continue
-            
-            blocks = [b.strip() for b in str(thm).split(';')]
-            matches = [block_scores[b] for b in blocks if b in block_scores]
-            if not matches:
-                continue
-            
-            cand_score = max(matches)
-            if abs(cand_score - pred) > score_tolerance or abs(cand_score - s23) > score_tolerance:
-                continue
-            
-            geo = self._calc_geo_score(sc, home_coords, selected_school_coords)
-            interest = self._interest_sim(selected_names, row['major_name'])
-            score_fit = 1 - ((abs(cand_score - pred) + abs(cand_score - s23)) / 2 / score_tolerance)
-            ranking = w_score * score_fit + w_geo * geo + w_interest * interest
-            
-            school_coords = _get_coords(sc, self.data['schools'])
-            dist_home = _haversine(*home_coords, *school_coords) if home_coords and school_coords else 9999
-            
-            sn = self.data['school_names'][self.data['school_names']['school_code'] == sc]
-            school_name = sn.iloc[0]['school_name'] if len(sn) > 0 else sc
-            
-            results.append({
-                'Mã trường': sc, 'Tên trường': school_name,
-                'Mã ngành': mc, 'Tên ngành': row['major_name'],
-                'Điểm 2023': round(s23, 2), 'Dự đoán': round(pred, 2),
-                'Điểm TS': round(cand_score, 2), 'Km': round(dist_home, 0),
-                'Score': round(ranking, 3)
-            })
-        
-        df = pd.DataFrame(results)
-        if len(df) == 0:
+        # Đổi weights/top_k chỉ xếp hạng lại trên tập đã lọc (cache theo sbd, NV, tolerance)
+        feasible_key = (str(sbd), selected, score_tolerance)
+        scored = self.feasible_cache.get(feasible_key)
+        if scored is None:
+            scored = self._feasible_parts(parts, selected, score_tolerance)
+            self.feasible_cache.put(feasible_key, scored)
+        idx, cand, geo, dist_home, interest = scored
+        pred, s23 = self.pred[idx], self.score_2023[idx]
+        
+        score_fit = 1 - ((np.abs(cand - pred) + np.abs(cand - s23)) / 2 / score_tolerance)
+        ranking = np.round(w_score * score_fit + w_geo * geo + w_interest * interest, 3)
+        
+        # Top K: argpartition rồi sort ổn định trong nhóm được chọn (hòa điểm giữ thứ tự catalog)
+        # top_k <= 0 -> bảng rỗng đủ cột (như head(top_k) của bản cũ khi có ngành phù hợp)
+        key = np.where(np.isnan(ranking), -np.inf, ranking)
+        k = min(max(top_k, 0), len(key))
+        if 0 < k < len(key):
+            kth = np.partition(key, len(key) - k)[len(key) - k]
+            top = np.flatnonzero(key >= kth)
+        else:
+            top = np.arange(len(key))
+        top = top[np.argsort(-key[top], kind='stable')][:k]
+        
+        if len(key) == 0:
             if verbose:
                 print("Không tìm thấy ngành phù hợp.")
+            self.result_cache.put(result_key, pd.DataFrame())
             return pd.DataFrame()
         
-        df = df.sort_values('Score', ascending=False).head(top_k).reset_index(drop=True)
+        rows = idx[top]
+        df = pd.DataFrame({
+            'Mã trường': self.catalog['school_code'].to_numpy()[rows],
+            'Tên trường': self.school_name[rows],
+            'Mã ngành': self.catalog['major_code'].to_numpy()[rows],
+            'Tên ngành': self.catalog['major_name'].to_numpy()[rows],
+            'Điểm 2023': np.round(s23[top], 2),
+            'Dự đoán': np.round(pred[top], 2),
+            'Điểm TS': np.round(cand[top], 2),
+            'Km': np.round(dist_home[top], 0),
+            'Score': ranking[top]
+        })
         df.index = df.index + 1
-        return df
+        self.result_cache.put(result_key, df)
+        return df.copy()
+    
+    def _candidate_parts(self, sbd: str) -> Optional[dict]:
+        """Tỉnh, điểm tổ hợp, tọa độ nhà của thí sinh (cache theo SBD). None nếu không tìm thấy."""
+        parts = self.candidate_cache.get(sbd)
+        if parts is None:
+            info = self._candidate_info(sbd)
+            if not info:
+                return None
+            parts = {
+                'MA_TINH': info['MA_TINH'],
+                'block_scores': _calc_block_scores(info, self.data['to_hop']),
+                'home_coords': self.province_coords.get(info['MA_TINH']),
+            }
+            self.candidate_cache.put(sbd, parts)
+        return parts
+    
+    def _feasible_parts(self, parts: dict, selected: tuple, score_tolerance: float) -> tuple:
+        """
+        Các ngành qua lọc điểm (trừ ngành đã chọn) cùng điểm thí sinh, geo, Km và interest
+        - mọi thứ của recommend không phụ thuộc weights/top_k.
+        """
+        block_scores = parts['block_scores']
+        selected_names, selected_school_coords = [], []
+        for sc, mc in selected:
+            sc_coords = self.school_coord_map.get(sc)
+            if sc_coords:
+                selected_school_coords.append(sc_coords)
+            rows = self.major_rows.get((sc, mc))
+            if rows:
+                selected_names.append(self.catalog.at[rows[0], 'major_name'])
+        
+        excluded_rows = [r for key in set(selected) for r in self.major_rows.get(key, [])]
+        
+        # Chỉ xét các ngành trong cửa sổ điểm của tổ hợp thí sinh, rồi kiểm tra chính xác
+        hits = self._window_rows(block_scores, score_tolerance)
+        cand = self._candidate_scores(block_scores, hits)
+        with np.errstate(invalid='ignore'):
+            feasible = (
+                ~np.isin(hits, excluded_rows) & ~np.isnan(cand) &
+                ~(np.abs(cand - self.pred[hits]) > score_tolerance) &
+                ~(np.abs(cand - self.score_2023[hits]) > score_tolerance)
+            )
+        idx, cand = hits[feasible], cand[feasible]
+        
+        geo, dist_home = self._geo_scores(idx, parts['home_coords'], selected_school_coords)
+        interest = self._interest_scores(selected_names)[idx]
+        return idx, cand, geo, dist_home, interest
+    
+    def _recommend_chunk(
+        self,
+        sbds: List[str],
+        score_tolerance: float,
+        top_k: int,
+        w_score: float,
+        w_geo: float,
+        w_interest: float
+    ) -> pd.DataFrame:
+        """
+        Gợi ý cho 1 khối thí sinh (chưa chọn NV) bằng ma trận thí sinh × ngành.
+        Kết quả giống recommend(sbd) cho từng thí sinh; thí sinh không tìm thấy
+        hoặc không đủ điểm bị bỏ qua, SBD lặp lại chỉ tính 1 lần.
+        """
+        if top_k <= 0:
+            return pd.DataFrame(columns=BATCH_COLUMNS)
+        sbds = pd.unique(np.array([str(s) for s in sbds], dtype=object))
+        pos = self.sbd_pos.reindex(sbds).dropna().astype(int).to_numpy()
+        rows = self.data['diem_thi_2024'].iloc[pos]
+        n_cand, n_major = len(rows), len(self.catalog)
+        
+        # Điểm tổ hợp (B × K), NaN nếu thiếu môn
+        nan_col = np.full(n_cand, np.nan)
+        subjects = {
+            s: rows[s].to_numpy(dtype=float) if s in rows.columns else nan_col
+            for s in CANDIDATE_SUBJECTS
+        }
+        block = np.full((n_cand, len(self.block_codes)), np.nan)
+        for k, b in enumerate(self.block_codes):
+            subs = self.data['to_hop'][b]
+            if len(subs) == 3:
+                a, b_, c = (subjects.get(x, nan_col) for x in subs)
+                block[:, k] = a + b_ + c
+        
+        # Điểm thí sinh theo ngành = max các tổ hợp khớp
+        cand = np.full((n_cand, n_major), np.nan)
+        for k, cols in enumerate(self.block_rows):
+            if len(cols):
+                cand[:, cols] = np.fmax(cand[:, cols], block[:, k:k + 1])
+        
+        with np.errstate(invalid='ignore'):
+            diff_pred, diff_23 = np.abs(cand - self.pred), np.abs(cand - self.score_2023)
+            feasible = (
+                self.valid & ~np.isnan(cand) &
+                ~(diff_pred > score_tolerance) & ~(diff_23 > score_tolerance)
+            )
+        
+        provinces, prov_idx = np.unique(rows['MA_TINH'].astype(str).to_numpy(), return_inverse=True)
+        home = [self._home_geo(p) for p in provinces]
+        geo = np.stack([g for g, _ in home])[prov_idx] if len(home) else np.empty((0, n_major))
+        km = np.stack([d for _, d in home])[prov_idx] if len(home) else np.empty((0, n_major))
+        
+        score_fit = 1 - ((diff_pred + diff_23) / 2 / score_tolerance)
+        ranking = np.round(w_score * score_fit + w_geo * geo + w_interest * 0.0, 3)
+        
+        # Khóa nguyên duy nhất: Score giảm dần, hòa thì thứ tự catalog (như recommend)
+        min_key = -(2 ** 40)
+        score_key = np.where(np.isnan(ranking), min_key, np.rint(ranking * 1000))
+        order_key = score_key.astype(np.int64) * n_major + (n_major - 1 - np.arange(n_major))
+        # Ngành không khả thi: min + 1 để -key không bị tràn số (vẫn xếp cuối)
+        infeasible = np.iinfo(np.int64).min + 1
+        order_key[~feasible] = infeasible
+        
+        k = min(top_k, n_major)
+        top = np.argpartition(order_key, n_major - k, axis=1)[:, n_major - k:]
+        top_keys = np.take_along_axis(order_key, top, axis=1)
+        top = np.take_along_axis(top, np.argsort(-top_keys, axis=1), axis=1)
+        keep = np.take_along_axis(order_key, top, axis=1) != infeasible
+        
+        r, j = np.nonzero(keep)
+        cols = top[r, j]
+        return pd.DataFrame({
+            'SBD': rows['SBD'].to_numpy()[r],
+            'Hạng': j + 1,
+            'Mã trường': self.catalog['school_code'].to_numpy()[cols],
+            'Tên trường': self.school_name[cols],
+            'Mã ngành': self.catalog['major_code'].to_numpy()[cols],
+            'Tên ngành': self.catalog['major_name'].to_numpy()[cols],
+            'Điểm 2023': np.round(self.score_2023[cols], 2),
+            'Dự đoán': np.round(self.pred[cols], 2),
+            'Điểm TS': np.round(cand[r, cols], 2),
+            'Km': km[r, cols],
+            'Score': ranking[r, cols]
+        }, columns=BATCH_COLUMNS)
+    
+    def recommend_batch(
+        self,
+        sbds: List[str],
+        score_tolerance: float = 1.0,
+        top_k: int = 10,
+        w_score: float = 0.4,
+        w_geo: float = 0.1,
+        w_interest: float = 0.5,
+        chunk_size: int = 1024,
+        n_jobs: int = 1,
+        output_path: Optional[str] = None,
+        verbose: bool = True
+    ) -> Optional[pd.DataFrame]:
+        """
+        Gợi ý top K ngành cho nhiều thí sinh (chưa chọn NV), dạng bảng dài.
+        
+        Args:
+            sbds: Danh sách số báo danh (SBD lặp lại chỉ tính 1 lần, giữ thứ tự xuất hiện)
+            chunk_size: Số thí sinh mỗi khối (bộ nhớ ~ chunk_size × số ngành × vài float64)
+            n_jobs: Số process (1 = chạy tại chỗ, -1 = tất cả CPU)
+            output_path: Nếu có, ghi dần từng khối ra Parquet và trả về None
+            (các tham số còn lại như recommend)
+        
+        Returns:
+            DataFrame cột BATCH_COLUMNS, hoặc None nếu ghi ra output_path
+        """
+        if not self.is_built:
+            self.build()
+        
+        sbds = list(pd.unique(np.array([str(s) for s in sbds], dtype=object)))
+        chunks = [sbds[i:i + chunk_size] for i in range(0, len(sbds), chunk_size)]
+        params = dict(score_tolerance=score_tolerance, top_k=top_k,
+                      w_score=w_score, w_geo=w_geo, w_interest=w_interest)
+        
+        executor = None
+        if n_jobs == 1 or len(chunks) <= 1:
+            results = (self._recommend_chunk(c, **params) for c in chunks)
+        else:
+            workers = os.cpu_count() if n_jobs < 0 else n_jobs
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(self,))
+            results = executor.map(_batch_worker, chunks, repeat(params))
+        
+        frames, writer, n_rows = [], None, 0
+        try:
+            for i, df in enumerate(results):
+                n_rows += len(df)
+                if verbose:
+                    print(f"Khối {i + 1}/{len(chunks)}: {len(df)} dòng gợi ý")
+                if output_path is None:
+                    frames.append(df)
+                    continue
+                if len(df) == 0:
+                    continue
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                if writer is None:
+                    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+                    table = pa.Table.from_pandas(df, preserve_index=False)
+                    writer = pq.ParquetWriter(output_path, table.schema)
+                else:
+                    table = pa.Table.from_pandas(df, schema=writer.schema, preserve_index=False)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+            if executor is not None:
+                executor.shutdown()
+        
+        if verbose:
+            print(f"Tổng: {n_rows} dòng gợi ý cho {len(sbds)} SBD")
+        if output_path is None:
+            if not frames:
+                return pd.DataFrame(columns=BATCH_COLUMNS)
+            return pd.concat(frames, ignore_index=True)
+        if writer is None:
+            pd.DataFrame(columns=BATCH_COLUMNS).to_parquet(output_path, index=False)
+        return None
+
+
+# Engine của worker process (recommend_batch với n_jobs > 1)
+_BATCH_ENGINE = None
+
+
+def _init_batch_worker(engine: RecommendationEngine):
+    global _BATCH_ENGINE
+    _BATCH_ENGINE = engine
+
+
+def _batch_worker(sbds: List[str], params: dict) -> pd.DataFrame:
+    return _BATCH_ENGINE._recommend_chunk(sbds, **params)
+
+
+_ENGINE_CACHE = {'data': None, 'engine': None}
+
+
+def get_engine(data: dict, rebuild: bool = False) -> RecommendationEngine:
+    """
+    Engine dùng chung cho cùng 1 dict data (so sánh bằng `is`).
+    Gọi rebuild=True nếu đã sửa data tại chỗ.
+    """
+    if rebuild or _ENGINE_CACHE['data'] is not data:
+        _ENGINE_CACHE['data'] = data
+        _ENGINE_CACHE['engine'] = RecommendationEngine(data)
+    return _ENGINE_CACHE['engine']
 
 
 def recommend(
@@ -302,7 +999,7 @@ def recommend(
     Returns:
         DataFrame với top K gợi ý
     """
-    engine = RecommendationEngine(data)
+    engine = get_engine(data)
     return engine.recommend(
         sbd=sbd,
         selected_majors=selected_majors,
@@ -310,3 +1007,48 @@ def recommend(
         top_k=top_k,
         verbose=verbose
     )
+
+
+def recommend_batch(
+    sbds: List[str],
+    data: dict,
+    score_tolerance: float = 1.0,
+    top_k: int = 10,
+    chunk_size: int = 1024,
+    n_jobs: int = 1,
+    output_path: Optional[str] = None,
+    verbose: bool = True
+) -> Optional[pd.DataFrame]:
+    """
+    Shortcut gợi ý cho cả nhóm thí sinh (chưa chọn NV).
+    
+    Args:
+        sbds: Danh sách số báo danh
+        data: Dict từ load_data()
+        chunk_size: Số thí sinh mỗi khối
+        n_jobs: Số process (-1 = tất cả CPU)
+        output_path: File Parquet để ghi dần kết quả
+    
+    Returns:
+        DataFrame (SBD, Hạng, ...) hoặc None nếu ghi ra output_path
+    """
+    return get_engine(data).recommend_batch(
+        sbds,
+        score_tolerance=score_tolerance,
+        top_k=top_k,
+        chunk_size=chunk_size,
+        n_jobs=n_jobs,
+        output_path=output_path,
+        verbose=verbose
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Recommendation system utilities')
+    parser.add_argument('command', choices=['snapshot'])
+    parser.add_argument('--snapshot-dir', default=None)
+    args = parser.parse_args(sys.argv[1:])
+    
+    if args.command == 'snapshot':
+        path = write_snapshot(snapshot_dir=args.snapshot_dir)
+        print(f"Đã ghi snapshot: {path}")
@@ -0,0 +1,383 @@
+"""
+HTTP/JSON service cục bộ cho hệ thống gợi ý (chỉ dùng thư viện chuẩn).
+
+Engine được load/build 1 lần khi khởi động. Các request /recommend đến cùng lúc
+được gom (micro-batching): nhóm chưa chọn NV cùng tham số được chấm điểm bằng 1
+lần recommend_batch (ma trận thí sinh × ngành), nhóm còn lại chạy lần lượt
+trên cùng engine.
+
+Endpoints:
+    POST /recommend        {"sbd": "...", "selected_majors": [["QSC", "7340101"]], "top_k": 10, ...}
+    POST /recommend_batch  {"sbds": ["...", ...], "top_k": 10, ...}
+    GET  /metrics          Histogram độ trễ (Prometheus text format)
+    GET  /health
+
+Mã lỗi: 400 input sai (selected_majors, top_k...), 404 SBD không tồn tại,
+422 thí sinh không đủ điểm để tính khối nào.
+
+Usage:
+    python src/recsys_service.py --port 8000
+    python src/recsys_service.py --engine models/recsys_engine.pkl   # khởi động nhanh từ engine đã lưu
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+import argparse
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    from recsys import RecommendationEngine, load_data
+except ImportError:
+    from src.recsys import RecommendationEngine, load_data
+
+
+# Tham số recommend được phép truyền qua JSON (giá trị mặc định như RecommendationEngine.recommend)
+RECOMMEND_PARAMS = {
+    'score_tolerance': 1.0,
+    'top_k': 10,
+    'w_score': 0.4,
+    'w_geo': 0.1,
+    'w_interest': 0.5,
+}
+
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+# =============================================================================
+# 1. METRICS
+# =============================================================================
+
+class Histogram:
+    """Histogram cộng dồn kiểu Prometheus (thread-safe)."""
+
+    def __init__(self, name: str, help_text: str, buckets: List[float]):
+        self.name, self.help_text, self.buckets = name, help_text, list(buckets)
+        self.counts: Dict[str, List[int]] = {}
+        self.sums: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, label: str = ''):
+        with self._lock:
+            counts = self.counts.setdefault(label, [0] * (len(self.buckets) + 1))
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    counts[i] += 1
+            counts[-1] += 1
+            self.sums[label] = self.sums.get(label, 0.0) + value
+
+    def render(self, label_name: str = 'endpoint') -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label, counts in sorted(self.counts.items()):
+                lbl = f'{label_name}="{label}",' if label else ''
+                for b, c in zip(self.buckets + ['+Inf'], counts):
+                    lines.append(f'{self.name}_bucket{{{lbl}le="{b}"}} {c}')
+                lbl = f'{{{label_name}="{label}"}}' if label else ''
+                lines.append(f"{self.name}_sum{lbl} {self.sums[label]:.3f}")
+                lines.append(f"{self.name}_count{lbl} {counts[-1]}")
+        return "\n".join(lines)
+
+
+# =============================================================================
+# 2. MICRO-BATCHING
+# =============================================================================
+
+def _to_records(df: pd.DataFrame) -> List[dict]:
+    """DataFrame -> list dict JSON (NaN -> null)."""
+    if len(df) == 0:
+        return []
+    return json.loads(df.to_json(orient='records', force_ascii=False))
+
+
+class MicroBatcher:
+    """
+    Gom các request /recommend đến trong max_wait_ms (tối đa max_batch request)
+    và xử lý trên 1 thread duy nhất sở hữu engine.
+    """
+
+    def __init__(
+        self,
+        engine: RecommendationEngine,
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        batch_sizes: Optional[Histogram] = None,
+        engine_lock: Optional[threading.Lock] = None
+    ):
+        self.engine = engine
+        self.max_batch, self.max_wait = max_batch, max_wait_ms / 1000
+        self.batch_sizes = batch_sizes
+        self.engine_lock = engine_lock or threading.Lock()
+        self._queue: "queue.Queue[Tuple[dict, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, request: dict) -> Future:
+        future = Future()
+        self._queue.put((request, future))
+        return future
+
+    def _run(self):
+        while True:
+            items = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(items) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if self.batch_sizes is not None:
+                self.batch_sizes.observe(len(items))
+            with self.engine_lock:
+                self._process(items)
+
+    def _process(self, items: List[Tuple[dict, Future]]):
+        # Nhóm chưa chọn NV theo tham số -> 1 lần recommend_batch
+        groups: Dict[tuple, List[Tuple[dict, Future]]] = {}
+        for request, future in items:
+            if request['selected_majors']:
+                self._run_single(request, future)
+            else:
+                key = tuple(request['params'][k] for k in RECOMMEND_PARAMS)
+                groups.setdefault(key, []).append((request, future))
+
+        for key, group in groups.items():
+            params = dict(zip(RECOMMEND_PARAMS, key))
+            # Nhiều request cùng SBD (thí sinh refresh) chỉ chấm 1 lần, mọi future nhận chung kết quả
+            sbds = list(dict.fromkeys(r['sbd'] for r, _ in group))
+            try:
+                df = self.engine.recommend_batch(sbds, verbose=False, **params)
+            except Exception as e:
+                for _, future in group:
+                    future.set_exception(e)
+                continue
+            by_sbd = {sbd: g.drop(columns=['SBD', 'Hạng']) for sbd, g in df.groupby('SBD', sort=False)}
+            for request, future in group:
+                rows = by_sbd.get(str(request['sbd']))
+                if rows is None:
+                    # Không có dòng nào: chạy đơn lẻ để có đúng lỗi (không tìm thấy / không đủ điểm)
+                    self._run_single(request, future)
+                else:
+                    future.set_result(_to_records(rows))
+
+    def _run_single(self, request: dict, future: Future):
+        try:
+            df = self.engine.recommend(
+                request['sbd'], selected_majors=request['selected_majors'], verbose=False, **request['params']
+            )
+            future.set_result(_to_records(df))
+        except Exception as e:
+            future.set_exception(e)
+
+
+# =============================================================================
+# 3. HTTP SERVER
+# =============================================================================
+
+def _parse_params(body: dict) -> dict:
+    params = {}
+    for k, default in RECOMMEND_PARAMS.items():
+        params[k] = type(default)(body.get(k, default))
+    if params['top_k'] < 1:
+        raise ValueError("'top_k' phải >= 1.")
+    if not params['score_tolerance'] > 0:
+        raise ValueError("'score_tolerance' phải > 0.")
+    return params
+
+
+def _parse_sbds(value) -> List[str]:
+    """sbds: list SBD (chuỗi hoặc số), bỏ trùng và giữ thứ tự xuất hiện."""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ValueError("'sbds' phải là list số báo danh.")
+    for item in value:
+        if isinstance(item, bool) or not isinstance(item, (str, int)):
+            raise ValueError(f"'sbds' có phần tử không hợp lệ: {item!r} (cần chuỗi hoặc số).")
+    return list(dict.fromkeys(str(s) for s in value))
+
+
+def _parse_selected_majors(value) -> List[Tuple[str, str]]:
+    """selected_majors: list các cặp [mã trường, mã ngành] (chuỗi; mã ngành nhận cả số)."""
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ValueError("'selected_majors' phải là list các cặp [mã trường, mã ngành].")
+    pairs = []
+    for item in value:
+        if (
+            not isinstance(item, list) or len(item) != 2 or not isinstance(item[0], str)
+            or isinstance(item[1], bool) or not isinstance(item[1], (str, int))
+        ):
+            raise ValueError(f"'selected_majors' có phần tử không hợp lệ: {item!r} (cần [mã trường, mã ngành]).")
+        pairs.append((item[0], str(item[1])))
+    return pairs
+
+
+class RecsysHandler(BaseHTTPRequestHandler):
+    """Handler JSON; engine/batcher/metrics lấy từ self.server."""
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status: int, payload, content_type: str = 'application/json'):
+        body = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        data = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}')
+        if not isinstance(body, dict):
+            raise ValueError("Body phải là JSON object.")
+        return body
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/metrics':
+            text = "\n".join([h.render() for h in self.server.histograms] + [self._cache_metrics()]) + "\n"
+            self._send(200, text, content_type='text/plain; version=0.0.4')
+        else:
+            self._send(404, {'error': f'Không có endpoint {self.path}'})
+
+    def _cache_metrics(self) -> str:
+        """Hit/miss các cache của engine (RecommendationEngine.cache_stats)."""
+        lines = []
+        for metric in ('hits', 'misses', 'hit_rate'):
+            kind = 'gauge' if metric == 'hit_rate' else 'counter'
+            name = f"recsys_cache_{metric}" + ('' if metric == 'hit_rate' else '_total')
+            lines.append(f"# TYPE {name} {kind}")
+            for cache, stats in self.server.engine.cache_stats().items():
+                lines.append(f'{name}{{cache="{cache}"}} {stats[metric]}')
+        return "\n".join(lines)
+
+    def do_POST(self):
+        start = time.perf_counter()
+        endpoint = self.path
+        if endpoint not in ('/recommend', '/recommend_batch'):
+            self._send(404, {'error': f'Không có endpoint {self.path}'})
+            return
+        try:
+            body = self._read_json()
+            if endpoint == '/recommend':
+                status, payload = self._recommend(body)
+            else:
+                status, payload = self._recommend_batch(body)
+        except (ValueError, TypeError, KeyError) as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            status, payload = 500, {'error': str(e)}
+        self._send(status, payload)
+        self.server.latency.observe((time.perf_counter() - start) * 1000, endpoint)
+
+    def _recommend(self, body: dict) -> Tuple[int, dict]:
+        if 'sbd' not in body:
+            raise ValueError("Thiếu 'sbd'.")
+        request = {
+            'sbd': str(body['sbd']),
+            'selected_majors': _parse_selected_majors(body.get('selected_majors')),
+            'params': _parse_params(body),
+        }
+        if request['sbd'] not in self.server.engine.sbd_pos.index:
+            return 404, {'sbd': request['sbd'], 'error': f"Không tìm thấy thí sinh: {request['sbd']}"}
+        try:
+            results = self.server.batcher.submit(request).result(timeout=self.server.timeout_s)
+        except ValueError as e:
+            # Input đã hợp lệ, SBD có thật: còn lại là thí sinh không đủ điểm tính khối nào
+            return 422, {'sbd': request['sbd'], 'error': str(e)}
+        return 200, {'sbd': request['sbd'], 'results': results}
+
+    def _recommend_batch(self, body: dict) -> Tuple[int, dict]:
+        sbds = _parse_sbds(body.get('sbds'))
+        params = _parse_params(body)
+        with self.server.engine_lock:
+            df = self.server.engine.recommend_batch(sbds, verbose=False, **params)
+        results = {sbd: _to_records(g.drop(columns=['SBD'])) for sbd, g in df.groupby('SBD', sort=False)}
+        return 200, {'results': results, 'missing': [s for s in sbds if s not in results]}
+
+
+class RecsysServer(ThreadingHTTPServer):
+    """ThreadingHTTPServer giữ engine đã build, micro-batcher và metrics."""
+
+    daemon_threads = True
+    request_queue_size = 1024  # backlog listen() lớn để chịu được đợt tải đột biến
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        engine: RecommendationEngine,
+        max_batch: int = 64,
+        max_wait_ms: float = 5.0,
+        timeout_s: float = 30.0,
+        verbose: bool = False
+    ):
+        super().__init__(address, RecsysHandler)
+        if not engine.is_built:
+            engine.build()
+        self.engine, self.timeout_s, self.verbose = engine, timeout_s, verbose
+        self.latency = Histogram('recsys_request_latency_ms', 'Độ trễ request (ms)', LATENCY_BUCKETS_MS)
+        self.batch_size = Histogram('recsys_microbatch_size', 'Số request mỗi micro-batch', BATCH_SIZE_BUCKETS)
+        self.histograms = [self.latency, self.batch_size]
+        # /recommend_batch chạy trên thread của request; khóa để không chạy song song với batcher
+        self.engine_lock = threading.Lock()
+        self.batcher = MicroBatcher(engine, max_batch, max_wait_ms, self.batch_size, self.engine_lock)
+
+
+def start_server(
+    engine: RecommendationEngine,
+    host: str = '127.0.0.1',
+    port: int = 0,
+    **kwargs
+) -> Tuple[RecsysServer, threading.Thread]:
+    """Chạy server trên thread nền (port=0 -> chọn port trống). Dùng cho test trên localhost."""
+    server = RecsysServer((host, port), engine, **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Local recommendation HTTP service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--engine', default=None, help='Engine đã lưu bằng RecommendationEngine.save()')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    t0 = time.perf_counter()
+    engine = RecommendationEngine.load(args.engine) if args.engine else RecommendationEngine(load_data())
+    print(f"Engine sẵn sàng sau {time.perf_counter() - t0:.1f}s")
+
+    server = RecsysServer(
+        (args.host, args.port), engine,
+        max_batch=args.max_batch, max_wait_ms=args.max_wait_ms, verbose=args.verbose
+    )
+    print(f"Serving http://{args.host}:{server.server_address[1]} (Ctrl+C để dừng)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -74,6 +74,75 @@ def calc_combination_scores(df, combo_dict):
 
     return pho_diem
 
+# Phổ điểm dạng mảng đếm: 1 ô = 0.01 điểm (điểm làm tròn 2 chữ số * SCORE_SCALE)
+SCORE_SCALE = 100
+MAX_TOTAL = 30
+N_CELLS = MAX_TOTAL * SCORE_SCALE + 1
+
+def score_cells(scores):
+    """
+    Ô điểm của từng thí sinh: rint(điểm * SCORE_SCALE), khớp với scores.round(2).
+    Điểm NaN / ngoài [0, MAX_TOTAL] -> -1
+    """
+    cells = np.rint(np.asarray(scores, dtype=float) * SCORE_SCALE)
+    valid = (cells >= 0) & (cells < N_CELLS)  # NaN -> False
+    out = np.full(len(cells), -1, dtype=np.int64)
+    out[valid] = cells[valid].astype(np.int64)
+    return out
+
+def score_histogram(scores):
+    """Mảng đếm N_CELLS ô từ Series / mảng điểm tổ hợp."""
+    cells = score_cells(scores)
+    return np.bincount(cells[cells >= 0], minlength=N_CELLS)
+
+# Tính phổ điểm tổ hợp dạng mảng đếm (không giữ điểm từng thí sinh)
+def calc_combination_histograms(df, combo_dict):
+    """
+    Giống calc_combination_scores nhưng mỗi (khối, năm) chỉ giữ mảng đếm cố định:
+    hist[khoi][nam] = np.ndarray N_CELLS ô, ô c = số thí sinh có điểm c / SCORE_SCALE
+    """
+    year_idx, years = pd.factorize(df["NĂM_THI"], sort=True)
+    hist = {}
+
+    for khoi, subjects in combo_dict.items():
+        # Chỉ tính thí sinh có đủ cả 3 môn, đếm tất cả các năm trong 1 lần bincount
+        valid = df[subjects].notna().all(axis=1).to_numpy() & (year_idx >= 0)
+        cells = score_cells(df.loc[valid, subjects].sum(axis=1))
+        keep = cells >= 0
+        flat = year_idx[valid][keep] * N_CELLS + cells[keep]
+        counts = np.bincount(flat, minlength=len(years) * N_CELLS)
+        counts = counts.reshape(len(years), N_CELLS)
+
+        hist[khoi] = {year: counts[i] for i, year in enumerate(years)}
+
+    return hist
+
+# Tìm ô có thí sinh gần nhất cho nhiều mốc cùng lúc
+def nearest_nonzero_cells(counts, target_cells, max_cells=SCORE_SCALE):
+    """
+    Với mỗi target, ô khác 0 gần nhất trong counts (lệch tối đa max_cells ô,
+    hòa thì lấy ô thấp hơn) — cùng kết quả với find_nearest_score nhưng
+    dùng searchsorted trên các ô khác 0 thay vì dò từng delta.
+    Trả về mảng ô, -1 nếu không có.
+    """
+    target_cells = np.asarray(target_cells, dtype=np.int64)
+    result = np.full(len(target_cells), -1, dtype=np.int64)
+    nonzero = np.flatnonzero(counts)
+    if len(nonzero) == 0:
+        return result
+
+    pos = np.searchsorted(nonzero, target_cells)
+    left = nonzero[np.maximum(pos - 1, 0)]
+    right = nonzero[np.minimum(pos, len(nonzero) - 1)]
+    far = np.iinfo(np.int64).max
+    dist_left = np.where(pos > 0, target_cells - left, far)
+    dist_right = np.where(pos < len(nonzero), right - target_cells, far)
+
+    best = np.where(dist_left <= dist_right, left, right)
+    found = np.minimum(dist_left, dist_right) <= max_cells
+    result[found] = best[found]
+    return result
+
 # Tìm điểm gần nhất để fill vào mốc 14–30
 def find_nearest_score(target, available_scores, step=0.01, max_range=1.0):
     """
@@ -91,24 +160,24 @@ def find_nearest_score(target, available_scores, step=0.01, max_range=1.0):
 # Xây dựng phân phối số lượng thí sinh cho các mốc điểm 14–30.
 def build_count_for_year(scores):
     """
-    scores: Series điểm tổ hợp đã làm sạch
-    Trả về dict {0: (count, real_used_score), ..., 30: (...)}
+    scores: Series điểm tổ hợp đã làm sạch,
+            hoặc mảng đếm N_CELLS ô (calc_combination_histograms)
+    Trả về dict {14: (count, real_used_score), ..., 30: (...)}
     """
-    scores = scores.round(2)
-    value_counts = scores.value_counts()
-    available = set(value_counts.index)
+    if isinstance(scores, np.ndarray):
+        counts = scores
+    else:
+        counts = score_histogram(scores)
 
-    result = {}
-    for target in range(14, 31):
+    targets = np.arange(14, 31)
+    cells = nearest_nonzero_cells(counts, targets * SCORE_SCALE)
 
-        if target in available:
-            result[target] = (int(value_counts[target]), float(target))
+    result = {}
+    for target, cell in zip(targets.tolist(), cells.tolist()):
+        if cell < 0:
+            result[target] = (0, None)
         else:
-            nearest = find_nearest_score(target, available)
-            if nearest is None:
-                result[target] = (0, None)
-            else:
-                result[target] = (int(value_counts[nearest]), float(nearest))
+            result[target] = (int(counts[cell]), cell / SCORE_SCALE)
     return result
 
 # Build toàn bộ count_table
@@ -182,7 +251,7 @@ if __name__ == "__main__":
     combo = load_combinations("data\\to_hop_cu.json")
 
     print("=== Tính điểm tổ hợp ===")
-    pho_diem = calc_combination_scores(df, combo)
+    pho_diem = calc_combination_histograms(df, combo)
 
     print("=== Tính số lượng theo mốc 14–30 ===")
     count_table = build_all_counts(pho_diem)
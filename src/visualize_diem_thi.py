@@ -5,6 +5,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 from pathlib import Path
 
+try:
+    from binned_scores import histogram_counts
+except ImportError:
+    from src.binned_scores import histogram_counts
+
 # nếu muốn dùng lại SUBJECTS từ binned_scores thì có thể import:
 # from binned_scores import SUBJECTS
 
@@ -133,21 +138,18 @@ def plot_subject_from_binned(
 
     years = sorted(df_sub["nam_thi"].unique())
 
-    plt.figure(figsize=(14, 6))
-
-    for year in years:
-        grp = df_sub[df_sub["nam_thi"] == year]
-        if grp.empty:
-            continue
-
-        # map (start, end) -> count
-        mapping = {
-            (row.bin_start, row.bin_end): row.count
-            for row in grp.itertuples(index=False)
-        }
+    # Ma trận (năm × bin) số thí sinh, cộng count trong 1 lần (kernel của binned_scores)
+    year_idx = np.searchsorted(years, df_sub["nam_thi"].to_numpy())
+    bin_idx = pd.MultiIndex.from_tuples(bins).get_indexer(
+        pd.MultiIndex.from_frame(df_sub[["bin_start", "bin_end"]])
+    )
+    count_matrix = histogram_counts(
+        bin_idx, len(bins), year_idx, len(years), weights=df_sub["count"].to_numpy()
+    )
 
-        counts = np.array([mapping.get((s, e), 0) for (s, e) in bins], dtype=float)
+    plt.figure(figsize=(14, 6))
 
+    for year, counts in zip(years, count_matrix):
         mean, median, n = _approx_stats_from_binned(centers, counts)
         label = f"{year} (μ≈{mean:.2f}, med≈{median:.2f}, n={n})"
 